@@ -1,5 +1,6 @@
 from typing import Collection
 from pathlib import Path
+import sys
 from settings import IS_DEBUG, LOGS_DEBUG_PREFIX, LOGS_WARNING_PREFIX, LOGS_ERROR_GENERIC_PREFIX, LOGS_SEPARATOR as s
 from python_helpers import get_caller, UNKNOWN_CALLER_NAME
 
@@ -11,7 +12,8 @@ class Logger:
         self.is_debug = is_debug
 
     def log(self, message: str) -> None:
-        print(message)
+        # stderr, so logs never mix with encoded output written to stdout
+        print(message, file=sys.stderr)
 
     def debug(self, message: str) -> None:
         if self.is_debug:
@@ -0,0 +1,153 @@
+"""This file contains functions for building and extracting archives in memory, without writing them into the working directory"""
+
+from typing import TYPE_CHECKING, BinaryIO, Iterator, Sequence
+from collections.abc import Buffer
+from contextlib import ExitStack, contextmanager
+import os
+import shutil
+from compression_helpers import open_compressing_writer
+from filesystem_helpers import open_mapped
+from settings import (
+    ARCHIVE_SPILL_THRESHOLD_BYTES,
+    COPY_BLOCK_SIZE_BYTES,
+    LOGS_ERROR_GENERIC_PREFIX,
+    LOGS_SEPARATOR as s,
+)
+from Logger import logger as l
+
+# tempfile and zipfile are imported by the functions that use them. Together they're a big part of the startup time
+if TYPE_CHECKING:
+    from tempfile import SpooledTemporaryFile
+
+
+# A zip starts with a local file header, or with the end of central directory record when it's empty
+ZIP_SIGNATURES: tuple[bytes, ...] = (b"PK\x03\x04", b"PK\x05\x06")
+ZIP_SIGNATURE_LENGTH: int = 4
+
+
+def make_zip_archive(
+    targets: Sequence[str], spill_threshold: int = ARCHIVE_SPILL_THRESHOLD_BYTES
+) -> "SpooledTemporaryFile[bytes]":
+    # Every target (a file or a directory) lands in the root of the archive under its own name
+    # A single target gives the same contents as shutil.make_archive(format='zip', root_dir=<its parent>, base_dir=<its name>)
+    # The zip is kept in memory until it grows past spill_threshold bytes. Only then it's moved into
+    # an anonymous temporary file, which is gone once closed - nothing is left in the working directory
+    # The returned file is rewound, so it can be handed straight to the encoder
+    from tempfile import SpooledTemporaryFile
+    import zipfile
+
+    logs_infix: str = f"{make_zip_archive.__name__}{s}{targets}{s}"
+    names: list[str] = get_target_names(targets, logs_infix)
+    archive: SpooledTemporaryFile[bytes] = SpooledTemporaryFile(max_size=spill_threshold)
+    try:
+        with zipfile.ZipFile(archive, "w", compression=zipfile.ZIP_DEFLATED) as zip_file:
+            for target, name in zip(targets, names):
+                root_dir: str = os.path.dirname(os.path.normpath(os.path.abspath(target)))
+                for path in _iter_archive_paths(name, root_dir):
+                    zip_file.write(os.path.join(root_dir, path), path)
+    except BaseException:
+        archive.close()
+        raise
+
+    l.debug(f"{logs_infix}Built zip archive{s}{archive.tell()} bytes")
+    archive.seek(0)
+    return archive
+
+
+def make_tar_archive(
+    targets: Sequence[str],
+    codec: str | None = None,
+    level: int | None = None,
+    spill_threshold: int = ARCHIVE_SPILL_THRESHOLD_BYTES,
+) -> "SpooledTemporaryFile[bytes]":
+    # Every target lands in the root of the archive under its own name, like with make_zip_archive
+    # Without a codec, that's a plain tar. With one (even "none"), the tar is streamed through the codec while
+    # it's written, so only the compressed payload is ever kept. It has a CODEC HEADER and can be handed straight
+    # to iter_encode_compressed_high_base
+    # Like a zip, it stays in memory until it grows past spill_threshold bytes. The returned file is rewound
+    from tempfile import SpooledTemporaryFile
+    import tarfile
+
+    logs_infix: str = f"{make_tar_archive.__name__}{s}{targets}{s}Codec: {codec}{s}"
+    names: list[str] = get_target_names(targets, logs_infix)
+    archive: SpooledTemporaryFile[bytes] = SpooledTemporaryFile(max_size=spill_threshold)
+    try:
+        with ExitStack() as stack:
+            dest: BinaryIO = archive  # type: ignore # SpooledTemporaryFile is a BinaryIO
+            if codec is not None:
+                dest = stack.enter_context(open_compressing_writer(dest, codec, level))
+            # "w|" writes a plain stream - the tar never seeks back into the compressed output
+            tar_file: tarfile.TarFile = stack.enter_context(tarfile.open(fileobj=dest, mode="w|"))
+            for target, name in zip(targets, names):
+                tar_file.add(target, arcname=name)
+    except BaseException:
+        archive.close()
+        raise
+
+    l.debug(f"{logs_infix}Built tar archive{s}{archive.tell()} bytes")
+    archive.seek(0)
+    return archive
+
+
+def get_target_names(targets: Sequence[str], logs_infix: str = "") -> list[str]:
+    # The names targets get in the root of an archive
+    names: list[str] = [os.path.basename(os.path.normpath(os.path.abspath(target))) for target in targets]
+    duplicate_names: set[str] = {name for name in names if names.count(name) > 1}
+    if duplicate_names:
+        raise RuntimeError(
+            f"{LOGS_ERROR_GENERIC_PREFIX}{s}{logs_infix}{duplicate_names}{s}Targets must have different names!"
+        )
+    return names
+
+
+@contextmanager
+def open_archive_buffer(
+    archive: "SpooledTemporaryFile[bytes]", spill_threshold: int = ARCHIVE_SPILL_THRESHOLD_BYTES
+) -> Iterator[Buffer]:
+    # The whole archive as a buffer, for encoders that slice their input in place
+    # An archive that spilled into a temporary file is mapped, so big archives are never copied into memory
+    # A smaller one is still in memory and is read out of it
+    size: int = archive.seek(0, os.SEEK_END)
+    archive.seek(0)
+    if size <= spill_threshold:
+        yield archive.read()
+        return
+    with open_mapped(archive) as data:  # type: ignore # SpooledTemporaryFile is a BinaryIO
+        yield data
+
+
+def get_is_zip_archive(header: bytes) -> bool:
+    return header[:ZIP_SIGNATURE_LENGTH] in ZIP_SIGNATURES
+
+
+def extract_zip_archive(
+    source: BinaryIO, dest: str, spill_threshold: int = ARCHIVE_SPILL_THRESHOLD_BYTES
+) -> None:
+    # A zip's index is at its very end, so the whole zip is gathered before anything is extracted
+    # Like when building one, it stays in memory until it grows past spill_threshold bytes
+    from tempfile import SpooledTemporaryFile
+    import zipfile
+
+    logs_infix: str = f"{extract_zip_archive.__name__}{s}{dest}{s}"
+    with SpooledTemporaryFile(max_size=spill_threshold) as archive:
+        shutil.copyfileobj(source, archive, COPY_BLOCK_SIZE_BYTES)
+        l.debug(f"{logs_infix}Gathered zip archive{s}{archive.tell()} bytes")
+        archive.seek(0)
+        with zipfile.ZipFile(archive) as zip_file:
+            # Member names are sanitized by extractall, so nothing lands outside of dest
+            zip_file.extractall(dest)
+
+
+def _iter_archive_paths(target: str, root_dir: str) -> Iterator[str]:
+    # Paths relative to root_dir, in the same order shutil.make_archive writes them
+    base_path: str = os.path.normpath(target)
+    if base_path != os.curdir:
+        yield base_path
+    for dir_path, dir_names, file_names in os.walk(os.path.join(root_dir, target)):
+        relative_dir_path: str = os.path.normpath(os.path.relpath(dir_path, root_dir))
+        for name in sorted(dir_names):
+            yield os.path.join(relative_dir_path, name)
+        for name in file_names:
+            path: str = os.path.join(relative_dir_path, name)
+            if os.path.isfile(os.path.join(root_dir, path)):
+                yield path
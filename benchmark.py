@@ -0,0 +1,321 @@
+"""This file contains benchmarks of the program. Run it directly, e.g.: python benchmark.py conversion --help"""
+
+from typing import Any
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+import argparse
+import json
+import multiprocessing
+import random
+import subprocess
+import sys
+import time
+import number_base_helpers
+from number_base_helpers import (
+    HighBaseMode,
+    decode_high_base,
+    encode_high_base,
+    set_big_int_backend,
+)
+from unicode_helpers import get_allowed_unicode_code_points
+from compression_helpers import (
+    CodecSearchResult,
+    CodecTrial,
+    get_available_codecs,
+    get_codec_search_table,
+    get_search_candidates,
+    search_codecs,
+)
+from filesystem_helpers import open_mapped
+
+resource: Any
+try:
+    import resource  # Only on Unix
+except ImportError:
+    resource = None
+
+
+type BenchmarkRecord = dict[str, Any]
+
+
+DEFAULT_SIZES: tuple[str, ...] = ("1K", "10K", "100K", "1M", "10M", "50M")
+# The integer mode is superlinear - past these sizes a single case would take minutes
+INTEGER_MODE_MAX_BYTES: dict[str, int] = {
+    "python": 2 * 1024 * 1024,
+    "gmpy2": 50 * 1024 * 1024,
+}
+SIZE_SUFFIXES: dict[str, int] = {"K": 1024, "M": 1024 * 1024}
+SEED: int = 0
+# Round-tripped before the clock starts, so the timed case doesn't include loading the alphabet and its tables
+WARM_UP_SIZE: int = 64
+# What a run imports before doing anything: the modules main imports, in its order, then main itself
+# main comes last, so whatever else it pulls in is still counted
+STARTUP_MODULES: tuple[str, ...] = (
+    "archive_helpers",
+    "cli_helpers",
+    "compression_helpers",
+    "number_base_helpers",
+    "data_helpers",
+    "light_archiver",
+    "pipeline_helpers",
+    "multipart_helpers",
+    "parallel_helpers",
+    "platform_helpers",
+    "main",
+)
+STARTUP_BUDGET_MS: float = 60.0
+STARTUP_REPEATS: int = 5
+STARTUP_SLOWEST_IMPORTS_COUNT: int = 10
+
+
+def main() -> None:
+    parser: argparse.ArgumentParser = argparse.ArgumentParser(description=__doc__)
+    subparsers = parser.add_subparsers(dest="benchmark", required=True)
+
+    conversion_parser: argparse.ArgumentParser = subparsers.add_parser(
+        "conversion", help="Encode and round-trip random payloads in every mode and big int backend"
+    )
+    conversion_parser.add_argument("--sizes", nargs="+", default=DEFAULT_SIZES, help="e.g. 1K 10M")
+    conversion_parser.add_argument("--modes", nargs="+", default=[mode.value for mode in HighBaseMode])
+    conversion_parser.add_argument("--backends", nargs="+", default=get_available_backends())
+    conversion_parser.add_argument("--baseline", help="JSON file from --save-baseline to compare against")
+    conversion_parser.add_argument("--save-baseline", help="Write the results to this JSON file")
+
+    startup_parser: argparse.ArgumentParser = subparsers.add_parser(
+        "startup", help="Time the imports of a run with -X importtime. Fails when over the budget"
+    )
+    startup_parser.add_argument("--modules", nargs="+", default=STARTUP_MODULES)
+    startup_parser.add_argument("--budget-ms", type=float, default=STARTUP_BUDGET_MS)
+    startup_parser.add_argument("--repeats", type=int, default=STARTUP_REPEATS, help="The best run is kept")
+
+    codecs_parser: argparse.ArgumentParser = subparsers.add_parser(
+        "codecs", help="Compress a file with every codec and level, and print the smallest and a size/time table"
+    )
+    codecs_parser.add_argument("path")
+    codecs_parser.add_argument(
+        "--codecs", nargs="+", default=[codec.name for codec in get_available_codecs()]
+    )
+    codecs_parser.add_argument("--workers", type=int, help="Processes to search in (default: PARALLEL_WORKERS_COUNT)")
+
+    arguments: argparse.Namespace = parser.parse_args()
+    if arguments.benchmark == "conversion":
+        run_conversion_benchmark(arguments)
+    elif arguments.benchmark == "startup":
+        run_startup_benchmark(arguments)
+    elif arguments.benchmark == "codecs":
+        run_codecs_benchmark(arguments)
+
+
+def get_available_backends() -> list[str]:
+    backends: list[str] = ["python"]
+    if number_base_helpers.get_gmpy2() is not None:
+        backends.append("gmpy2")
+    return backends
+
+
+def parse_size(text: str) -> int:
+    suffix: str = text[-1].upper()
+    if suffix in SIZE_SUFFIXES:
+        return int(text[:-1]) * SIZE_SUFFIXES[suffix]
+    return int(text)
+
+
+def run_conversion_benchmark(arguments: argparse.Namespace) -> None:
+    sizes: list[int] = [parse_size(size) for size in arguments.sizes]
+    records: list[BenchmarkRecord] = []
+    for backend in arguments.backends:
+        for mode in arguments.modes:
+            for size in sizes:
+                if mode == HighBaseMode.INTEGER.value and size > INTEGER_MODE_MAX_BYTES[backend]:
+                    print(f"Skipping {get_case_key(mode, backend, size)} (too slow)", file=sys.stderr)
+                    continue
+                print(f"Running {get_case_key(mode, backend, size)}...", file=sys.stderr)
+                records.append(run_case_in_new_process(mode, backend, size))
+
+    baseline: dict[str, BenchmarkRecord] = {}
+    if arguments.baseline:
+        with open(arguments.baseline, "rt", encoding="utf-8") as f:
+            baseline = {get_record_key(record): record for record in json.load(f)}
+    print_comparison_table(records, baseline)
+
+    if arguments.save_baseline:
+        with open(arguments.save_baseline, "wt", encoding="utf-8") as f:
+            json.dump(records, f, indent=4)
+
+
+def run_case_in_new_process(mode: str, backend: str, size: int) -> BenchmarkRecord:
+    # A fresh process per case, so the peak RSS of one case doesn't hide the next one
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=1, mp_context=context) as executor:
+        return executor.submit(run_case, mode, backend, size).result()
+
+
+def run_case(mode_name: str, backend: str, size: int) -> BenchmarkRecord:
+    set_big_int_backend(backend)
+    mode: HighBaseMode = HighBaseMode(mode_name)
+    data: bytes = random.Random(SEED).randbytes(size)
+
+    # The one-time setup of a run is reported on its own, so it doesn't hide the conversion of small cases
+    start: float = time.perf_counter()
+    warm_up_data: bytes = random.Random(SEED + 1).randbytes(WARM_UP_SIZE)
+    if decode_high_base(encode_high_base(warm_up_data, mode)) != warm_up_data:
+        raise RuntimeError(f"{get_case_key(mode_name, backend, size)} Warm-up round trip changed the data!")
+    setup_seconds: float = time.perf_counter() - start
+
+    start = time.perf_counter()
+    text: str = encode_high_base(data, mode)
+    encode_seconds: float = time.perf_counter() - start
+
+    start = time.perf_counter()
+    decoded: bytes = decode_high_base(text)
+    decode_seconds: float = time.perf_counter() - start
+    if decoded != data:
+        raise RuntimeError(f"{get_case_key(mode_name, backend, size)} Round trip changed the data!")
+
+    record: BenchmarkRecord = {
+        "mode": mode_name,
+        "backend": backend,
+        "size": size,
+        "alphabet_size": len(get_allowed_unicode_code_points()),
+        "signs": len(text),
+        "setup_seconds": setup_seconds,
+        "encode_seconds": encode_seconds,
+        "decode_seconds": decode_seconds,
+        "signs_per_second": len(text) / encode_seconds if encode_seconds else 0.0,
+        "peak_rss_mb": get_peak_rss_mb(),
+    }
+    return record
+
+
+def get_peak_rss_mb() -> float | None:
+    if resource is None:
+        return None
+    peak_rss: int = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Kilobytes on Linux, bytes on macOS
+    divisor: int = 1024 * 1024 if sys.platform == "darwin" else 1024
+    return peak_rss / divisor
+
+
+def get_case_key(mode: str, backend: str, size: int) -> str:
+    return f"{mode}/{backend}/{size}"
+
+
+def get_record_key(record: BenchmarkRecord) -> str:
+    return get_case_key(record["mode"], record["backend"], record["size"])
+
+
+def run_startup_benchmark(arguments: argparse.Namespace) -> None:
+    # Every repeat is a fresh interpreter. The best one is kept, since noise only ever adds time
+    best_import_times: dict[str, int] | None = None
+    for _ in range(arguments.repeats):
+        import_times: dict[str, int] = measure_import_times(arguments.modules)
+        if best_import_times is None or sum(import_times.values()) < sum(best_import_times.values()):
+            best_import_times = import_times
+    assert best_import_times is not None
+
+    rows: list[tuple[str, str]] = [("module", "cumulative ms")]
+    for module in arguments.modules:
+        # Modules already imported by an earlier one cost nothing on their own
+        microseconds: int = best_import_times.get(module, 0)
+        rows.append((module, f"{microseconds / 1000:.1f}"))
+    total_ms: float = sum(best_import_times.values()) / 1000
+    rows.append(("total", f"{total_ms:.1f}"))
+    rows.append(("budget", f"{arguments.budget_ms:.1f}"))
+    width: int = max(len(module) for module, _ in rows)
+    for module, milliseconds in rows:
+        print(f"{module.ljust(width)}  {milliseconds}")
+
+    if total_ms > arguments.budget_ms:
+        print(f"Startup imports took {total_ms:.1f} ms - over the {arguments.budget_ms:.1f} ms budget!", file=sys.stderr)
+        print_slowest_imports(arguments.modules)
+        sys.exit(1)
+
+
+def measure_import_times(modules: list[str]) -> dict[str, int]:
+    # Cumulative microseconds of every module imported directly by the command, as -X importtime reports them
+    report: str = run_importtime(modules)
+    import_times: dict[str, int] = {}
+    for self_microseconds, cumulative_microseconds, name in parse_importtime(report):
+        # Nested imports are indented by two more spaces. Top level ones have a single space
+        if name.startswith("  ") or name.strip() not in modules:
+            continue
+        import_times[name.strip()] = cumulative_microseconds
+    return import_times
+
+
+def print_slowest_imports(modules: list[str]) -> None:
+    # By self time, so it's clear which import to make lazy
+    report: str = run_importtime(modules)
+    imports: list[tuple[int, int, str]] = sorted(parse_importtime(report), reverse=True)
+    print("Slowest imports (self ms):", file=sys.stderr)
+    for self_microseconds, _, name in imports[:STARTUP_SLOWEST_IMPORTS_COUNT]:
+        print(f"  {self_microseconds / 1000:.1f}  {name.strip()}", file=sys.stderr)
+
+
+def run_importtime(modules: list[str]) -> str:
+    command: list[str] = [sys.executable, "-X", "importtime", "-c", f"import {', '.join(modules)}"]
+    result: subprocess.CompletedProcess[str] = subprocess.run(
+        command, capture_output=True, text=True, cwd=Path(__file__).parent
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"Importing {', '.join(modules)} failed!\n{result.stderr}")
+    return result.stderr
+
+
+def parse_importtime(report: str) -> list[tuple[int, int, str]]:
+    # Lines look like: "import time:       self [us] |   cumulative |   name"
+    imports: list[tuple[int, int, str]] = []
+    for line in report.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        self_text, cumulative_text, name = line.removeprefix("import time:").split("|")
+        if not self_text.strip().isdigit():
+            continue  # The column headers
+        imports.append((int(self_text), int(cumulative_text), name))
+    return imports
+
+
+def run_codecs_benchmark(arguments: argparse.Namespace) -> None:
+    candidates: list[tuple[str, int]] = [
+        (codec, level) for codec, level in get_search_candidates() if codec in arguments.codecs
+    ]
+    with open(arguments.path, "rb") as f, open_mapped(f) as data:
+        result: CodecSearchResult = search_codecs(data, candidates, arguments.workers)
+    print(get_codec_search_table(result))
+    winner: CodecTrial = result.winner
+    print(f"Smallest: {winner.codec} level {winner.level} ({winner.compressed_bytes} bytes)")
+
+
+def print_comparison_table(records: list[BenchmarkRecord], baseline: dict[str, BenchmarkRecord]) -> None:
+    columns: tuple[str, ...] = ("case", "setup s", "encode s", "decode s", "signs/s", "peak RSS MB", "vs baseline")
+    rows: list[tuple[str, ...]] = []
+    for record in records:
+        key: str = get_record_key(record)
+        comparison: str = "-"
+        if key in baseline:
+            base_record: BenchmarkRecord = baseline[key]
+            encode_change: float = record["encode_seconds"] / base_record["encode_seconds"] - 1
+            decode_change: float = record["decode_seconds"] / base_record["decode_seconds"] - 1
+            comparison = f"enc {encode_change:+.1%} dec {decode_change:+.1%}"
+            if base_record["alphabet_size"] != record["alphabet_size"]:
+                comparison += f" (alphabet {base_record['alphabet_size']} -> {record['alphabet_size']})"
+        peak_rss: str = "-" if record["peak_rss_mb"] is None else f"{record['peak_rss_mb']:.1f}"
+        rows.append(
+            (
+                key,
+                f"{record['setup_seconds']:.3f}",
+                f"{record['encode_seconds']:.3f}",
+                f"{record['decode_seconds']:.3f}",
+                f"{record['signs_per_second']:.0f}",
+                peak_rss,
+                comparison,
+            )
+        )
+
+    widths: list[int] = [max(len(row[i]) for row in [columns, *rows]) for i in range(len(columns))]
+    for row in [columns, *rows]:
+        print("  ".join(cell.ljust(width) for cell, width in zip(row, widths)))
+
+
+if __name__ == "__main__":
+    main()
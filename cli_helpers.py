@@ -1,5 +1,28 @@
 """This file contains helper functions for managing the CLI of the program"""
+from typing import BinaryIO, Iterator, TextIO, cast
+from contextlib import contextmanager
+import argparse
+import io
+import sys
 from filesystem_helpers import get_children
+from number_base_helpers import HighBaseEstimate, HighBaseMode, TransportSink
+from compression_helpers import AUTO_CODEC, CODEC_NAMES
+from multipart_helpers import PartHeader, PartsCollector, get_is_part, split_into_parts
+from platform_helpers import get_system_clipboard, set_system_clipboard
+from settings import (
+    CLIPBOARD_PART_MAX_SIGNS,
+    COMPRESSION_CODEC,
+    HIGH_BASE_MODE,
+    UNICODE_ALPHABET_PROFILE,
+    UNICODE_ALPHABET_PROFILES,
+    LOGS_ERROR_GENERIC_PREFIX,
+    LOGS_SEPARATOR as s,
+)
+
+
+# "-" in place of a path means stdin / stdout
+STANDARD_STREAM_PATH: str = "-"
+_COMMANDS: tuple[str, ...] = ("encode", "decode")
 
 
 def get_zip_target() -> str:
@@ -12,4 +35,246 @@ def get_zip_target() -> str:
         target: str = input('Target: ')
         if target in children:
             break
-    return target
\ No newline at end of file
+    return target
+
+
+def get_arguments(argv: list[str] | None = None) -> argparse.Namespace:
+    # Without a command, "encode" is assumed - so plain `main.py` still asks for a target interactively
+    if argv is None:
+        argv = sys.argv[1:]
+    if not argv or argv[0] not in (*_COMMANDS, "-h", "--help"):
+        argv = ["encode", *argv]
+
+    parser: argparse.ArgumentParser = argparse.ArgumentParser(
+        description="Packs files, directories or text into a single line of unicode text and back"
+    )
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    encode_parser: argparse.ArgumentParser = subparsers.add_parser(
+        "encode", help="Encode files, directories, stdin or text into unicode text"
+    )
+    encode_input = encode_parser.add_mutually_exclusive_group()
+    encode_input.add_argument(
+        "targets",
+        nargs="*",
+        default=[],
+        help=f"Files and directories to archive and encode together, or {STANDARD_STREAM_PATH} to encode stdin as it is."
+        " Asked for interactively when missing",
+    )
+    encode_input.add_argument("--text", help="Encode this text (as UTF-8) instead of files")
+    encode_output = encode_parser.add_mutually_exclusive_group()
+    encode_output.add_argument(
+        "-o", "--output", default=STANDARD_STREAM_PATH, help="Where to write the encoded text (default: stdout)"
+    )
+    encode_output.add_argument(
+        "--clipboard",
+        action="store_true",
+        help=f"Copy the encoded text into the clipboard. Texts over {CLIPBOARD_PART_MAX_SIGNS} signs are copied in parts, one by one",
+    )
+    encode_parser.add_argument(
+        "--part",
+        type=int,
+        nargs="+",
+        dest="parts",
+        metavar="INDEX",
+        help="With --clipboard, copy only these parts (e.g. to send a failed part again)",
+    )
+    encode_parser.add_argument(
+        "--mode", choices=[mode.value for mode in HighBaseMode], default=HIGH_BASE_MODE
+    )
+    encode_alphabet = encode_parser.add_mutually_exclusive_group()
+    encode_alphabet.add_argument(
+        "--profile", choices=list(UNICODE_ALPHABET_PROFILES), default=UNICODE_ALPHABET_PROFILE
+    )
+    encode_alphabet.add_argument(
+        "--sink",
+        choices=[sink.value for sink in TransportSink],
+        help="Pick the alphabet profile that transmits the fewest units per input byte to this destination",
+    )
+    encode_parser.add_argument(
+        "--codec",
+        choices=[*CODEC_NAMES, AUTO_CODEC],
+        default=COMPRESSION_CODEC,
+        help=f"Compress the data before encoding it. {AUTO_CODEC} picks the codec and level that look fastest overall on a sample",
+    )
+    encode_parser.add_argument("--level", type=int, help="Level of the codec (default: the codec's own default)")
+    encode_parser.add_argument(
+        "--dry-run",
+        action="store_true",
+        help="Only print how long the output would be, without encoding anything",
+    )
+
+    decode_parser: argparse.ArgumentParser = subparsers.add_parser(
+        "decode", help="Decode unicode text back into the original bytes"
+    )
+    decode_input = decode_parser.add_mutually_exclusive_group()
+    decode_input.add_argument(
+        "source", nargs="?", default=STANDARD_STREAM_PATH, help="File with the encoded text (default: stdin)"
+    )
+    decode_input.add_argument("--clipboard", action="store_true", help="Decode the text in the clipboard")
+    decode_output = decode_parser.add_mutually_exclusive_group()
+    decode_output.add_argument(
+        "-o", "--output", default=STANDARD_STREAM_PATH, help="Where to write the decoded bytes (default: stdout)"
+    )
+    decode_output.add_argument(
+        "--extract",
+        metavar="DIR",
+        help="Extract the decoded archive (a zip or a light archive) into this directory instead",
+    )
+
+    arguments: argparse.Namespace = parser.parse_args(argv)
+    if arguments.command == "encode" and STANDARD_STREAM_PATH in arguments.targets and len(arguments.targets) > 1:
+        encode_parser.error(f"{STANDARD_STREAM_PATH} (stdin) can't be mixed with other targets")
+    if arguments.command == "encode" and arguments.parts and not arguments.clipboard:
+        encode_parser.error("--part only works with --clipboard")
+    if arguments.command == "encode" and arguments.clipboard and arguments.targets == [STANDARD_STREAM_PATH]:
+        # Copying in parts waits for Enter on stdin between the parts
+        encode_parser.error(f"--clipboard can't be used with {STANDARD_STREAM_PATH} (stdin)")
+    if arguments.command == "encode" and arguments.level is not None and arguments.codec in ("none", AUTO_CODEC):
+        # none has no levels, and auto picks the level along with the codec
+        encode_parser.error(f"--level can't be used with --codec {arguments.codec}")
+    return arguments
+
+
+@contextmanager
+def open_text_input(path: str) -> Iterator[TextIO]:
+    # Line breaks are skipped - they're never valid signs, but encoded texts are often saved or pasted with them
+    source: TextIO
+    if path == STANDARD_STREAM_PATH:
+        source = io.TextIOWrapper(sys.stdin.buffer, encoding="utf-8")
+        try:
+            yield cast(TextIO, LineBreaksSkippingReader(source))
+        finally:
+            source.detach()
+        return
+    with open(path, "rt", encoding="utf-8") as source:
+        yield cast(TextIO, LineBreaksSkippingReader(source))
+
+
+@contextmanager
+def open_clipboard_input() -> Iterator[TextIO]:
+    # A text copied in parts is collected part by part, in whatever order they're copied
+    text: str = _strip_line_breaks(get_system_clipboard())
+    if get_is_part(text):
+        text = collect_clipboard_parts(text)
+    yield cast(TextIO, io.StringIO(text))
+
+
+def _prompt(message: str) -> str:
+    # input() would print the message to stdout, which may be the decoded output
+    print(message, end='', file=sys.stderr, flush=True)
+    return input()
+
+
+def collect_clipboard_parts(first_part: str) -> str:
+    collector: PartsCollector = PartsCollector()
+    part: str = first_part
+    while True:
+        try:
+            header: PartHeader = collector.add(part)
+            print(f'Got part {header.part_index}/{header.total}', file=sys.stderr)
+        except RuntimeError as error:
+            print(f'Skipped the clipboard: {error}', file=sys.stderr)
+        if collector.get_is_complete():
+            return collector.join()
+        missing_indices: list[int] = collector.get_missing_indices()
+        if missing_indices:
+            print(f'Missing parts: {", ".join(map(str, missing_indices))}', file=sys.stderr)
+        _prompt('Copy another part and press Enter...')
+        part = _strip_line_breaks(get_system_clipboard())
+
+
+def copy_to_clipboard(text: str, part_indices: list[int] | None = None) -> None:
+    # Every part is copied after the previous one was pasted (confirmed with Enter)
+    # Any part can be copied again by typing its number instead
+    parts: list[str] = split_into_parts(text)
+    if len(parts) == 1:
+        # A text that fits is copied as it is, so it can be pasted anywhere
+        parts = [text]
+    total: int = len(parts)
+    for requested_index in part_indices or []:
+        if not 1 <= requested_index <= total:
+            raise RuntimeError(
+                f"{LOGS_ERROR_GENERIC_PREFIX}{s}{copy_to_clipboard.__name__}{s}Part: {requested_index}"
+                f"{s}There are only {total} parts!"
+            )
+
+    queue: list[int] = list(part_indices or range(1, total + 1))
+    while queue:
+        index: int = queue.pop(0)
+        if set_system_clipboard(parts[index - 1]):
+            print(f'Copied part {index}/{total}', file=sys.stderr)
+        else:
+            print(f'Failed to copy part {index}/{total}!', file=sys.stderr)
+            queue.insert(0, index)
+        if not queue:
+            break
+        answer: str = _prompt(f'Press Enter to copy part {queue[0]}, or type a part number to copy it instead: ')
+        if answer.strip().isdigit() and 1 <= int(answer) <= total:
+            queue.insert(0, int(answer))
+
+
+@contextmanager
+def open_text_output(path: str) -> Iterator[TextIO]:
+    output: TextIO
+    if path == STANDARD_STREAM_PATH:
+        output = io.TextIOWrapper(sys.stdout.buffer, encoding="utf-8", newline="")
+        try:
+            yield output
+        finally:
+            output.flush()
+            output.detach()
+        return
+    with open(path, "wt", encoding="utf-8", newline="") as output:
+        yield output
+
+
+@contextmanager
+def open_binary_output(path: str) -> Iterator[BinaryIO]:
+    if path == STANDARD_STREAM_PATH:
+        yield sys.stdout.buffer
+        sys.stdout.buffer.flush()
+        return
+    with open(path, "wb") as output:
+        yield output
+
+
+class LineBreaksSkippingReader(io.TextIOBase):
+    # A text source that never returns "\r" or "\n". read(size) still returns `size` characters unless at EOF
+    source: TextIO
+
+    def __init__(self, source: TextIO) -> None:
+        self.source = source
+
+    def readable(self) -> bool:
+        return True
+
+    def read(self, size: int | None = -1) -> str:
+        if size is None or size < 0:
+            return _strip_line_breaks(self.source.read())
+
+        parts: list[str] = []
+        count: int = 0
+        while count < size:
+            text: str = self.source.read(size - count)
+            if not text:
+                break
+            text = _strip_line_breaks(text)
+            parts.append(text)
+            count += len(text)
+        return "".join(parts)
+
+
+def _strip_line_breaks(text: str) -> str:
+    return text.replace("\r", "").replace("\n", "")
+
+
+def print_estimate(estimate: HighBaseEstimate) -> None:
+    print(
+        f"Mode: {estimate.mode.value}"
+        f"\nProfile: {estimate.profile}"
+        f"\nCodec: {estimate.codec} ({estimate.payload_bytes} bytes to encode)"
+        f"\nSigns: {estimate.signs_count}"
+        f"\nUTF-8 bytes: ~{estimate.utf8_bytes_expected} ({estimate.utf8_bytes_min} - {estimate.utf8_bytes_max})"
+        f"\nUTF-16 bytes: ~{estimate.utf16_bytes_expected} ({estimate.utf16_bytes_min} - {estimate.utf16_bytes_max})"
+    )
@@ -1 +1,664 @@
-"""This file contains functions for easily compressing files via many compression algorithms"""
\ No newline at end of file
+"""This file contains functions for easily compressing files via many compression algorithms"""
+
+from typing import Any, BinaryIO, Callable, Iterable, Iterator, NamedTuple, Sequence
+from collections import Counter
+from collections.abc import Buffer
+from types import ModuleType
+import functools
+import io
+import itertools
+import math
+import time
+from data_helpers import open_parts_reader
+from settings import (
+    COMPRESSION_AUTO_ENCODE_BYTES_PER_SECOND,
+    COMPRESSION_AUTO_SAMPLE_BYTES,
+    COMPRESSION_AUTO_SAMPLE_SLICES,
+    COMPRESSION_PROBE_MAX_ENTROPY,
+    COMPRESSION_PROBE_MIN_SAVING,
+    COMPRESSION_PROBE_SAMPLE_BYTES,
+    COMPRESSION_PROBE_TRIAL_CODEC,
+    COMPRESSION_SEARCH_SLICE_BYTES,
+    COPY_BLOCK_SIZE_BYTES,
+    LOGS_ERROR_GENERIC_PREFIX,
+    LOGS_SEPARATOR as s,
+)
+from Logger import logger as l
+
+
+# Layout of a compressed payload: [ CODEC HEADER ] ( COMPRESSED DATA )
+# CODEC HEADER is a single byte telling which codec made the COMPRESSED DATA, so decompressing needs no other hints
+# The level isn't stored - no codec here needs it to decompress
+AUTO_CODEC: str = "auto"
+CODEC_HEADER_LENGTH: int = 1
+
+
+@functools.lru_cache(maxsize=1)
+def get_zstandard() -> ModuleType | None:
+    # zstandard is optional. Without it the zstd codec is unavailable
+    try:
+        import zstandard  # type: ignore # missing stubs
+    except ImportError:
+        return None
+    return zstandard
+
+
+@functools.lru_cache(maxsize=1)
+def get_brotli() -> ModuleType | None:
+    # brotli is optional. Without it the brotli codec is unavailable
+    try:
+        import brotli  # type: ignore # missing stubs
+    except ImportError:
+        return None
+    return brotli
+
+
+class Codec:
+    # Stores the data as it is. Every codec compresses a stream of parts into a stream of parts
+    # The standard library modules are imported on first use, so importing this file stays cheap
+    name: str = "none"
+    header: int = 0
+    levels: tuple[int, ...] = (0,)
+    default_level: int = 0
+    # Levels `auto` tries. The rest are rarely worth their time
+    auto_levels: tuple[int, ...] = (0,)
+    # The optional package the codec needs, if any
+    package: str | None = None
+
+    def is_available(self) -> bool:
+        return True
+
+    def new_compressor(self, level: int) -> tuple[Callable[[Buffer], bytes], Callable[[], bytes]]:
+        # (compress, flush) - data can be pushed into a compressor, not only pulled through compress_parts
+        return bytes, bytes
+
+    def compress_parts(self, parts: Iterable[Buffer], level: int) -> Iterator[bytes]:
+        compress, flush = self.new_compressor(level)
+        yield from _compress_with(compress, flush, parts)
+
+    def decompress_parts(self, parts: Iterable[Buffer]) -> Iterator[bytes]:
+        for part in parts:
+            yield bytes(part)
+
+
+class ZlibCodec(Codec):
+    name = "zlib"
+    header = 1
+    levels = tuple(range(1, 10))
+    default_level = 6
+    auto_levels = (1, 6, 9)
+
+    def new_compressor(self, level: int) -> tuple[Callable[[Buffer], bytes], Callable[[], bytes]]:
+        import zlib
+
+        compressor: Any = zlib.compressobj(level)
+        return compressor.compress, compressor.flush
+
+    def decompress_parts(self, parts: Iterable[Buffer]) -> Iterator[bytes]:
+        import zlib
+
+        decompressor: Any = zlib.decompressobj()
+        yield from _decompress_with(decompressor.decompress, decompressor.flush, lambda: decompressor.eof, parts)
+
+
+class LzmaCodec(Codec):
+    name = "lzma"
+    header = 2
+    levels = tuple(range(0, 10))
+    default_level = 6
+    auto_levels = (0, 6)
+
+    def new_compressor(self, level: int) -> tuple[Callable[[Buffer], bytes], Callable[[], bytes]]:
+        import lzma
+
+        compressor: Any = lzma.LZMACompressor(preset=level)
+        return compressor.compress, compressor.flush
+
+    def decompress_parts(self, parts: Iterable[Buffer]) -> Iterator[bytes]:
+        import lzma
+
+        decompressor: Any = lzma.LZMADecompressor()
+        yield from _decompress_with(decompressor.decompress, None, lambda: decompressor.eof, parts)
+
+
+class Bz2Codec(Codec):
+    name = "bz2"
+    header = 3
+    levels = tuple(range(1, 10))
+    default_level = 9
+    auto_levels = (9,)
+
+    def new_compressor(self, level: int) -> tuple[Callable[[Buffer], bytes], Callable[[], bytes]]:
+        import bz2
+
+        compressor: Any = bz2.BZ2Compressor(level)
+        return compressor.compress, compressor.flush
+
+    def decompress_parts(self, parts: Iterable[Buffer]) -> Iterator[bytes]:
+        import bz2
+
+        decompressor: Any = bz2.BZ2Decompressor()
+        yield from _decompress_with(decompressor.decompress, None, lambda: decompressor.eof, parts)
+
+
+class ZstdCodec(Codec):
+    name = "zstd"
+    header = 4
+    levels = tuple(range(1, 23))
+    default_level = 3
+    auto_levels = (3, 10, 19)
+    package = "zstandard"
+
+    def is_available(self) -> bool:
+        return get_zstandard() is not None
+
+    def new_compressor(self, level: int) -> tuple[Callable[[Buffer], bytes], Callable[[], bytes]]:
+        zstandard: Any = get_zstandard()
+        compressor: Any = zstandard.ZstdCompressor(level=level).compressobj()
+        return compressor.compress, compressor.flush
+
+    def decompress_parts(self, parts: Iterable[Buffer]) -> Iterator[bytes]:
+        zstandard: Any = get_zstandard()
+        decompressor: Any = zstandard.ZstdDecompressor().decompressobj()
+        yield from _decompress_with(decompressor.decompress, None, lambda: decompressor.eof, parts)
+
+
+class ZstdDictionaryCodec(ZstdCodec):
+    # zstd with a trained dictionary. The dictionary isn't part of the payload, so it's needed to decompress too
+    # Made per dictionary, so it's not in the registry
+    name = "zstd-dict"
+    header = 6
+    dictionary: bytes
+
+    def __init__(self, dictionary: bytes) -> None:
+        self.dictionary = dictionary
+
+    def new_compressor(self, level: int) -> tuple[Callable[[Buffer], bytes], Callable[[], bytes]]:
+        zstandard: Any = get_zstandard()
+        dictionary: Any = _get_zstd_dictionary(self.dictionary, level)
+        compressor: Any = zstandard.ZstdCompressor(level=level, dict_data=dictionary).compressobj()
+        return compressor.compress, compressor.flush
+
+    def decompress_parts(self, parts: Iterable[Buffer]) -> Iterator[bytes]:
+        zstandard: Any = get_zstandard()
+        dictionary: Any = _get_zstd_dictionary(self.dictionary)
+        decompressor: Any = zstandard.ZstdDecompressor(dict_data=dictionary).decompressobj()
+        yield from _decompress_with(decompressor.decompress, None, lambda: decompressor.eof, parts)
+
+
+class BrotliCodec(Codec):
+    name = "brotli"
+    header = 5
+    levels = tuple(range(0, 12))
+    default_level = 11
+    auto_levels = (5, 11)
+    package = "brotli"
+
+    def is_available(self) -> bool:
+        return get_brotli() is not None
+
+    def new_compressor(self, level: int) -> tuple[Callable[[Buffer], bytes], Callable[[], bytes]]:
+        brotli: Any = get_brotli()
+        compressor: Any = brotli.Compressor(quality=level)
+        return compressor.process, compressor.finish
+
+    def decompress_parts(self, parts: Iterable[Buffer]) -> Iterator[bytes]:
+        brotli: Any = get_brotli()
+        decompressor: Any = brotli.Decompressor()
+        yield from _decompress_with(decompressor.process, None, decompressor.is_finished, parts)
+
+
+# DO NOT CHANGE the headers of existing codecs - texts made with them couldn't be decompressed anymore
+_CODECS: dict[str, Codec] = {
+    codec.name: codec
+    for codec in (Codec(), ZlibCodec(), LzmaCodec(), Bz2Codec(), ZstdCodec(), BrotliCodec())
+}
+_HEADER_CODECS: dict[int, Codec] = {codec.header: codec for codec in _CODECS.values()}
+CODEC_NAMES: tuple[str, ...] = tuple(_CODECS)
+
+
+def get_codec(name: str) -> Codec:
+    if name not in _CODECS:
+        raise RuntimeError(
+            f"{LOGS_ERROR_GENERIC_PREFIX}{s}{get_codec.__name__}{s}Codec: {name}"
+            f"{s}Unknown codec! Options: {', '.join(CODEC_NAMES)}"
+        )
+    return _CODECS[name]
+
+
+def get_available_codecs() -> list[Codec]:
+    return [codec for codec in _CODECS.values() if codec.is_available()]
+
+
+def get_codec_header(codec_name: str, dictionary: bytes | None = None) -> int:
+    # The CODEC HEADER compress_stream starts its payload with, for formats that store it once for many payloads
+    codec, _ = _get_compressing_codec(codec_name, None, dictionary)
+    return codec.header
+
+
+def compress_stream(
+    parts: Iterable[Buffer], codec_name: str, level: int | None = None, dictionary: bytes | None = None
+) -> Iterator[bytes]:
+    # A dictionary (see train_zstd_dictionary) switches zstd to its dictionary variant
+    codec, chosen_level = _get_compressing_codec(codec_name, level, dictionary)
+    l.debug(f"{compress_stream.__name__}{s}Codec: {codec.name}{s}Level: {chosen_level}")
+    yield bytes([codec.header])
+    yield from codec.compress_parts(parts, chosen_level)
+
+
+class CompressingWriter(io.RawIOBase):
+    # Everything written into it goes through the codec into dest, as the same payload compress_stream makes
+    # So producers that write (tarfile, the light archiver) feed the compressor directly, without an intermediate file
+    # Closing it flushes the codec. dest is left open
+    dest: BinaryIO
+    # Not named compress/flush - IOBase already has a flush() with a different meaning
+    compress_part: Callable[[Buffer], bytes]
+    finish: Callable[[], bytes]
+
+    def __init__(
+        self, dest: BinaryIO, codec_name: str, level: int | None = None, dictionary: bytes | None = None
+    ) -> None:
+        super().__init__()
+        codec, chosen_level = _get_compressing_codec(codec_name, level, dictionary)
+        l.debug(f"{CompressingWriter.__name__}{s}Codec: {codec.name}{s}Level: {chosen_level}")
+        self.dest = dest
+        self.compress_part, self.finish = codec.new_compressor(chosen_level)
+        dest.write(bytes([codec.header]))
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data: Buffer) -> int:  # type: ignore # RawIOBase allows any buffer
+        length: int = memoryview(data).nbytes
+        compressed: bytes = self.compress_part(data)
+        if compressed:
+            self.dest.write(compressed)
+        return length
+
+    def close(self) -> None:
+        if not self.closed:
+            self.dest.write(self.finish())
+        super().close()
+
+
+def open_compressing_writer(
+    dest: BinaryIO,
+    codec_name: str,
+    level: int | None = None,
+    dictionary: bytes | None = None,
+    buffer_size: int = COPY_BLOCK_SIZE_BYTES,
+) -> io.BufferedWriter:
+    # Buffered, so producers writing many small blocks (e.g. 512 byte tar records) don't call the codec for each
+    return io.BufferedWriter(CompressingWriter(dest, codec_name, level, dictionary), buffer_size)
+
+
+def open_decompressing_reader(
+    source: BinaryIO, dictionary: bytes | None = None, buffer_size: int = COPY_BLOCK_SIZE_BYTES
+) -> io.BufferedReader:
+    # The payload in source, decompressed while it's being read
+    blocks: Iterator[bytes] = iter(lambda: source.read(COPY_BLOCK_SIZE_BYTES), b"")
+    return open_parts_reader(decompress_stream(blocks, dictionary), buffer_size)
+
+
+def _get_compressing_codec(codec_name: str, level: int | None, dictionary: bytes | None) -> tuple[Codec, int]:
+    codec: Codec = get_codec(codec_name)
+    if dictionary is not None:
+        if codec.name != ZstdCodec.name:
+            raise RuntimeError(
+                f"{LOGS_ERROR_GENERIC_PREFIX}{s}{compress_stream.__name__}{s}Codec: {codec.name}"
+                f"{s}Only {ZstdCodec.name} can compress with a dictionary!"
+            )
+        codec = ZstdDictionaryCodec(dictionary)
+    _ensure_codec_available(codec)
+    chosen_level: int = codec.default_level if level is None else level
+    if chosen_level not in codec.levels:
+        raise RuntimeError(
+            f"{LOGS_ERROR_GENERIC_PREFIX}{s}{compress_stream.__name__}{s}Codec: {codec.name}{s}Level: {chosen_level}"
+            f"{s}Unsupported level! Options: {codec.levels[0]} - {codec.levels[-1]}"
+        )
+    return codec, chosen_level
+
+
+def decompress_stream(parts: Iterable[Buffer], dictionary: bytes | None = None) -> Iterator[bytes]:
+    # The CODEC HEADER is the first byte of the first non-empty part
+    # Payloads compressed with a dictionary need the same dictionary here
+    parts_iterator: Iterator[Buffer] = iter(parts)
+    first_part: memoryview = memoryview(b"")
+    for part in parts_iterator:
+        first_part = memoryview(part).cast("B")
+        if first_part:
+            break
+    if not first_part:
+        raise RuntimeError(
+            f"{LOGS_ERROR_GENERIC_PREFIX}{s}{decompress_stream.__name__}{s}Missing codec header!"
+            f"{s}Tip: Your text may be invalid"
+        )
+
+    header: int = first_part[0]
+    if header == ZstdDictionaryCodec.header:
+        if dictionary is None:
+            raise RuntimeError(
+                f"{LOGS_ERROR_GENERIC_PREFIX}{s}{decompress_stream.__name__}{s}Header: {header}"
+                f"{s}This payload needs the zstd dictionary it was compressed with!"
+            )
+        yield from _decompress_with_codec(ZstdDictionaryCodec(dictionary), first_part, parts_iterator)
+        return
+    if header not in _HEADER_CODECS:
+        raise RuntimeError(
+            f"{LOGS_ERROR_GENERIC_PREFIX}{s}{decompress_stream.__name__}{s}Header: {header}"
+            f"{s}Unknown codec header!{s}Tip: Your text may be invalid or made by a newer version"
+        )
+    yield from _decompress_with_codec(_HEADER_CODECS[header], first_part, parts_iterator)
+
+
+def _decompress_with_codec(codec: Codec, first_part: memoryview, rest: Iterator[Buffer]) -> Iterator[bytes]:
+    _ensure_codec_available(codec)
+    l.debug(f"{decompress_stream.__name__}{s}Codec: {codec.name}")
+    yield from codec.decompress_parts(_prepend(first_part[CODEC_HEADER_LENGTH:], rest))
+
+
+def train_zstd_dictionary(samples: Sequence[bytes], dictionary_size: int) -> bytes | None:
+    # A shared dictionary lets many small, similar payloads (e.g. config files) compress as well as one big one
+    # None when there's too little to learn from - zstd refuses to train on a few tiny samples
+    logs_infix: str = f"{train_zstd_dictionary.__name__}{s}Samples: {len(samples)}{s}Size: {dictionary_size}{s}"
+    codec: Codec = get_codec(ZstdCodec.name)
+    _ensure_codec_available(codec)
+    zstandard: Any = get_zstandard()
+    try:
+        dictionary: Any = zstandard.train_dictionary(dictionary_size, list(samples))
+    except zstandard.ZstdError as error:
+        l.warn(f"{logs_infix}Training failed, compressing without a dictionary{s}{error}")
+        return None
+    dictionary_bytes: bytes = dictionary.as_bytes()
+    l.debug(f"{logs_infix}Trained a dictionary{s}ID: {dictionary.dict_id()}{s}{len(dictionary_bytes)} bytes")
+    return dictionary_bytes
+
+
+def get_zstd_dictionary_id(dictionary: bytes) -> int:
+    # The ID zstd put into the dictionary when training it. Frames compressed with it carry the same ID
+    return _get_zstd_dictionary(dictionary).dict_id()
+
+
+def compress(data: Buffer, codec_name: str, level: int | None = None) -> bytes:
+    return b"".join(compress_stream([data], codec_name, level))
+
+
+def decompress(data: Buffer) -> bytes:
+    return b"".join(decompress_stream([data]))
+
+
+def get_sample(data: Buffer, sample_size: int = COMPRESSION_AUTO_SAMPLE_BYTES) -> bytes:
+    # A few slices spread evenly over the data, so a sample of a big archive doesn't only see its first files
+    data_view: memoryview = memoryview(data).cast("B")
+    if len(data_view) <= sample_size:
+        return bytes(data_view)
+    slice_size: int = sample_size // COMPRESSION_AUTO_SAMPLE_SLICES
+    stride: int = len(data_view) // COMPRESSION_AUTO_SAMPLE_SLICES
+    return b"".join(
+        data_view[i * stride : i * stride + slice_size] for i in range(COMPRESSION_AUTO_SAMPLE_SLICES)
+    )
+
+
+def read_sample(
+    source: BinaryIO | Buffer, sample_size: int = COMPRESSION_AUTO_SAMPLE_BYTES
+) -> tuple[bytes, BinaryIO | Buffer]:
+    # (sample, the source to use from now on). A stream can't be read twice, so its sample
+    # is taken from the front and put back in front of the rest
+    if isinstance(source, Buffer):
+        return get_sample(source, sample_size), source
+    sample: bytearray = bytearray()
+    while len(sample) < sample_size:
+        part: bytes = source.read(sample_size - len(sample))
+        if not part:
+            break
+        sample += part
+    rest: Iterator[bytes] = iter(functools.partial(source.read, COPY_BLOCK_SIZE_BYTES), b"")
+    return bytes(sample), open_parts_reader(itertools.chain([bytes(sample)], rest))
+
+
+def pick_codec(sample: Buffer) -> tuple[str, int, float]:
+    # (codec, level, compressed size to sample size) with the lowest estimated time to compress and then encode
+    # Every saved byte is a byte less to encode, so a slower codec wins as long as it saves enough
+    logs_infix: str = f"{pick_codec.__name__}{s}"
+    sample_size: int = memoryview(sample).nbytes
+    if not sample_size:
+        return "none", 0, 1.0
+
+    candidates: list[tuple[float, str, int, int]] = []  # (seconds, codec, level, compressed size)
+    for codec in get_available_codecs():
+        for level in codec.auto_levels:
+            start: float = time.perf_counter()
+            compressed_size: int = sum(len(part) for part in compress_stream([sample], codec.name, level))
+            compress_seconds: float = time.perf_counter() - start
+            if codec.name == "none":
+                compress_seconds = 0.0
+            seconds: float = compress_seconds + compressed_size / COMPRESSION_AUTO_ENCODE_BYTES_PER_SECOND
+            candidates.append((seconds, codec.name, level, compressed_size))
+            l.debug(
+                f"{logs_infix}Codec: {codec.name}{s}Level: {level}{s}Size: {compressed_size}/{sample_size}"
+                f"{s}Compressing: {compress_seconds:.4f}s{s}Estimate: {seconds:.4f}s"
+            )
+
+    _, codec_name, level, compressed_size = min(candidates)
+    return codec_name, level, compressed_size / sample_size
+
+
+class CompressibilityProbe(NamedTuple):
+    entropy: float  # Shannon entropy of the sample's bytes, in bits per byte (0 - 8)
+    trial_ratio: float | None  # Compressed to original size of the sample with the trial codec, when it was tried
+    is_compressible: bool
+
+
+def probe_compressibility(data: Buffer, sample_size: int = COMPRESSION_PROBE_SAMPLE_BYTES) -> CompressibilityProbe:
+    # A cheap guess whether compressing the data is worth it, e.g. already compressed media and archives aren't
+    # Byte entropy well under 8 bits means the data surely shrinks. Entropy near 8 bits can still hide repeats
+    # an order-0 estimate can't see, so then a fast codec is tried on the sample
+    logs_infix: str = f"{probe_compressibility.__name__}{s}"
+    sample: bytes = get_sample(data, sample_size)
+    if not sample:
+        return CompressibilityProbe(0.0, None, False)
+
+    entropy: float = get_byte_entropy(sample)
+    trial_ratio: float | None = None
+    is_compressible: bool = entropy <= COMPRESSION_PROBE_MAX_ENTROPY
+    if not is_compressible:
+        trial_codec: Codec = get_codec(COMPRESSION_PROBE_TRIAL_CODEC)
+        trial_size: int = sum(len(part) for part in trial_codec.compress_parts([sample], trial_codec.levels[0]))
+        trial_ratio = trial_size / len(sample)
+        is_compressible = trial_ratio <= 1 - COMPRESSION_PROBE_MIN_SAVING
+    l.debug(
+        f"{logs_infix}Sample: {len(sample)}{s}Entropy: {entropy:.3f}{s}Trial: {trial_ratio}{s}Compressible: {is_compressible}"
+    )
+    return CompressibilityProbe(entropy, trial_ratio, is_compressible)
+
+
+def get_byte_entropy(data: Buffer) -> float:
+    data_view: memoryview = memoryview(data).cast("B")
+    counts: Counter[int] = Counter(data_view)
+    length: int = len(data_view)
+    entropy: float = -sum(count / length * math.log2(count / length) for count in counts.values())
+    return entropy
+
+
+class CodecTrial(NamedTuple):
+    codec: str
+    level: int
+    # Compressed size with the CODEC HEADER. For aborted trials, the size reached when they were dropped
+    compressed_bytes: int
+    seconds: float
+    is_aborted: bool
+
+
+class CodecSearchResult(NamedTuple):
+    winner: CodecTrial
+    trials: list[CodecTrial]  # In the order of the candidates
+
+
+def get_search_candidates() -> list[tuple[str, int]]:
+    # Every level of every available codec
+    return [(codec.name, level) for codec in get_available_codecs() for level in codec.levels]
+
+
+def search_codecs(
+    data: Buffer,
+    candidates: Sequence[tuple[str, int]] | None = None,
+    workers_count: int | None = None,
+) -> CodecSearchResult:
+    # Finds the (codec, level) that makes the smallest payload. Ties go to the faster one
+    # The data is put into shared memory once and every worker process reads it from there
+    # A trial is dropped as soon as its output so far is bigger than the smallest finished one,
+    # starting with "none" - no codec may make the payload bigger than storing it as it is
+    logs_infix: str = f"{search_codecs.__name__}{s}"
+    data_view: memoryview = memoryview(data).cast("B")
+    if candidates is None:
+        candidates = get_search_candidates()
+    if workers_count is None:
+        from parallel_helpers import get_workers_count
+
+        workers_count = get_workers_count()
+
+    raw_trial: CodecTrial = CodecTrial("none", 0, len(data_view) + CODEC_HEADER_LENGTH, 0.0, False)
+    l.debug(f"{logs_infix}Length: {len(data_view)}{s}Candidates: {len(candidates)}{s}Workers: {workers_count}")
+
+    from multiprocessing.shared_memory import SharedMemory
+    from parallel_helpers import get_process_context, get_process_pool_executor
+
+    # The smallest finished size so far, shared by every worker
+    best_size: Any = get_process_context().Value("q", raw_trial.compressed_bytes)
+    trials: list[CodecTrial]
+    if workers_count == 1 or len(candidates) == 1:
+        _init_search_worker(data_view, best_size)
+        try:
+            trials = [_run_codec_trial(codec, level) for codec, level in candidates]
+        finally:
+            _init_search_worker(None, None)
+    else:
+        # Empty shared memory isn't allowed
+        shared_memory: SharedMemory = SharedMemory(create=True, size=max(1, len(data_view)))
+        try:
+            # Only closed shared memory has no buffer
+            shared_buffer: memoryview | None = shared_memory.buf
+            assert shared_buffer is not None
+            shared_buffer[: len(data_view)] = data_view
+            with get_process_pool_executor(
+                workers_count,
+                initializer=_attach_search_worker,
+                initargs=(shared_memory.name, len(data_view), best_size),
+            ) as executor:
+                trials = list(executor.map(_run_codec_trial, *zip(*candidates)))
+        finally:
+            shared_memory.close()
+            shared_memory.unlink()
+
+    finished_trials: list[CodecTrial] = [raw_trial] + [trial for trial in trials if not trial.is_aborted]
+    winner: CodecTrial = min(finished_trials, key=lambda trial: (trial.compressed_bytes, trial.seconds))
+    l.debug(f"{logs_infix}Winner: {winner.codec} {winner.level}{s}{winner.compressed_bytes} bytes")
+    return CodecSearchResult(winner, trials)
+
+
+# State of a search worker process, set by its initializer
+_search_data: memoryview | None = None
+_search_best_size: Any = None
+_search_shared_memory: Any = None
+
+
+def _attach_search_worker(shared_memory_name: str, length: int, best_size: Any) -> None:
+    from multiprocessing.shared_memory import SharedMemory
+
+    global _search_shared_memory
+    shared_memory: SharedMemory = SharedMemory(name=shared_memory_name)
+    # Kept referenced, so the mapping stays alive as long as the worker
+    _search_shared_memory = shared_memory
+    shared_buffer: memoryview | None = shared_memory.buf
+    assert shared_buffer is not None
+    _init_search_worker(shared_buffer[:length], best_size)
+
+
+def _init_search_worker(data: memoryview | None, best_size: Any) -> None:
+    global _search_data, _search_best_size
+    _search_data = data
+    _search_best_size = best_size
+
+
+def _run_codec_trial(codec_name: str, level: int) -> CodecTrial:
+    assert _search_data is not None
+    data: memoryview = _search_data
+    slices: Iterator[memoryview] = (
+        data[start : start + COMPRESSION_SEARCH_SLICE_BYTES]
+        for start in range(0, len(data), COMPRESSION_SEARCH_SLICE_BYTES)
+    )
+    start_time: float = time.perf_counter()
+    compressed_bytes: int = 0
+    for part in compress_stream(slices, codec_name, level):
+        compressed_bytes += len(part)
+        # Output only grows, so a trial that's already bigger can't win anymore
+        if compressed_bytes > _search_best_size.value:
+            return CodecTrial(codec_name, level, compressed_bytes, time.perf_counter() - start_time, True)
+    seconds: float = time.perf_counter() - start_time
+
+    with _search_best_size.get_lock():
+        if compressed_bytes < _search_best_size.value:
+            _search_best_size.value = compressed_bytes
+    return CodecTrial(codec_name, level, compressed_bytes, seconds, False)
+
+
+def get_codec_search_table(result: CodecSearchResult) -> str:
+    rows: list[tuple[str, ...]] = [("codec", "level", "bytes", "seconds", "")]
+    for trial in result.trials:
+        note: str = "aborted" if trial.is_aborted else ""
+        if trial == result.winner:
+            note = "winner"
+        size: str = f">{trial.compressed_bytes}" if trial.is_aborted else str(trial.compressed_bytes)
+        rows.append((trial.codec, str(trial.level), size, f"{trial.seconds:.3f}", note))
+    widths: list[int] = [max(len(row[i]) for row in rows) for i in range(len(rows[0]))]
+    return "\n".join("  ".join(cell.ljust(width) for cell, width in zip(row, widths)).rstrip() for row in rows)
+
+
+def _compress_with(compress: Any, flush: Any, parts: Iterable[Buffer]) -> Iterator[bytes]:
+    # Compressors buffer internally and often return nothing, so only non-empty parts are passed on
+    for part in parts:
+        compressed: bytes = compress(part)
+        if compressed:
+            yield compressed
+    yield flush()
+
+
+def _decompress_with(
+    decompress: Any, flush: Any | None, get_is_finished: Callable[[], bool], parts: Iterable[Buffer]
+) -> Iterator[bytes]:
+    # Decompressors return what they can of a cut off stream without complaining, so the end of it is checked here
+    for part in parts:
+        decompressed: bytes = decompress(part)
+        if decompressed:
+            yield decompressed
+    if flush is not None:
+        yield flush()
+    if not get_is_finished():
+        raise RuntimeError(
+            f"{LOGS_ERROR_GENERIC_PREFIX}{s}{_decompress_with.__name__}{s}The compressed data ends too early!"
+            f"{s}Tip: Your text may be cut off or invalid"
+        )
+
+
+@functools.lru_cache(maxsize=4)
+def _get_zstd_dictionary(dictionary: bytes, level: int | None = None) -> Any:
+    # Digesting a dictionary takes a while, so it's done once per level instead of once per payload
+    zstandard: Any = get_zstandard()
+    prepared: Any = zstandard.ZstdCompressionDict(dictionary)
+    if level is not None:
+        prepared.precompute_compress(level=level)
+    return prepared
+
+
+def _prepend(first: Buffer, rest: Iterator[Buffer]) -> Iterator[Buffer]:
+    yield first
+    yield from rest
+
+
+def _ensure_codec_available(codec: Codec) -> None:
+    # Codecs of optional packages are registered either way, so texts made with them fail with a clear message
+    if not codec.is_available():
+        raise RuntimeError(
+            f"{LOGS_ERROR_GENERIC_PREFIX}{s}{_ensure_codec_available.__name__}{s}Codec: {codec.name}"
+            f"{s}Codec unavailable!{s}Tip: Install its package (pip install {codec.package})"
+        )
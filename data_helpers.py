@@ -1,6 +1,7 @@
 """This file contains functions that are helpful for manipulating and analyzing data"""
 
-from typing import Any, TypeVar
+from typing import Any, Iterable, Iterator, TypeVar
+import io
 
 
 A = TypeVar("A")
@@ -23,3 +24,39 @@ def dict_keys_contain_substring(dictionary: Any, substring: str) -> bool:
 def pad_list_from_left(list: list[A], padding: A, desired_length: int) -> list[A]:
     to_pad: int = desired_length - len(list)
     return [padding] * to_pad + list
+
+
+class PartsReader(io.RawIOBase):
+    # A binary stream over an iterator of bytes, so data that's produced part by part can be read like a file
+    parts: Iterator[bytes]
+    part: memoryview
+    position: int
+
+    def __init__(self, parts: Iterable[bytes]) -> None:
+        self.parts = iter(parts)
+        self.part = memoryview(b"")
+        self.position = 0
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, buffer: Any) -> int:
+        while not self.part:
+            part: bytes | None = next(self.parts, None)
+            if part is None:
+                return 0
+            self.part = memoryview(part)
+        # Parts are sliced as views, so reading a big part in small pieces never copies the rest of it
+        count: int = min(len(buffer), len(self.part))
+        buffer[:count] = self.part[:count]
+        self.part = self.part[count:]
+        self.position += count
+        return count
+
+    def tell(self) -> int:
+        return self.position
+
+
+def open_parts_reader(parts: Iterable[bytes], buffer_size: int = io.DEFAULT_BUFFER_SIZE) -> io.BufferedReader:
+    # Buffered, so it can also be peeked into. It can't seek, but tell() works
+    return io.BufferedReader(PartsReader(parts), buffer_size)
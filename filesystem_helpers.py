@@ -1,6 +1,9 @@
 """This file contains functions that interact with the filesystem"""
 
-from typing import Collection
+from typing import BinaryIO, Collection, Iterator
+from collections.abc import Buffer
+from contextlib import contextmanager
+import mmap
 import os
 from pathlib import Path
 from settings import LOGS_ERROR_GENERIC_PREFIX, LOGS_SEPARATOR as s
@@ -83,3 +86,23 @@ def get_nonexistent_paths(paths: Collection[Path]) -> set[Path]:
         if not exists:
             invalid.add(path)
     return invalid
+
+
+@contextmanager
+def open_mapped(file: BinaryIO) -> Iterator[Buffer]:
+    # The whole file as a read-only buffer. The OS pages it in on demand, so no private copy is ever made
+    # Slices of the buffer mustn't outlive the `with` block
+    logs_infix: str = f"{open_mapped.__name__}{s}"
+    size: int = os.fstat(file.fileno()).st_size
+    if size == 0:
+        # Empty files can't be mapped
+        yield b""
+        return
+
+    l.debug(f"{logs_infix}Mapping {size} bytes")
+    with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+        view: memoryview = memoryview(mapped)
+        try:
+            yield view
+        finally:
+            view.release()
@@ -31,6 +31,23 @@ This file contains functions regarding "Light Archives".
     *[ 0x2F ] is an '/' utf-8 character). This is the only utf-8 character that cannot be used in both ext4 and NTFS filenames
     (having two different name terminators allows to store a single bit of information)
 
+    An archive with compressed files starts with a CODEC element. It has no NAME, which no other element may have:
+    [ NAME TERMINATOR #1 ] [ CODEC HEADER ]
+    CODEC HEADER tells which codec compressed the files (see compression_helpers). It's stored once for all of them
+    In such an archive the LENGTH of every file is doubled, and its lowest bit is IS COMPRESSED
+    Compressed DATA is what the codec made, without its CODEC HEADER. The other files are stored as they are
+    ^(every file is probed on its own, so already compressed files aren't compressed again)
+    Archives made without a codec have no CODEC element and their LENGTHs aren't doubled, so they pay nothing for it
+
+    Next may come a DICTIONARY element. It has no NAME either:
+    [ NAME TERMINATOR #0 ] ( [ LENGTH { IS ENDING } ] ... ) [ DICTIONARY KIND ] ( DICTIONARY )
+    LENGTH is the length of the DICTIONARY KIND and the DICTIONARY together (in bytes)
+    DICTIONARY KIND:
+    - #0 - the DICTIONARY is the trained zstd dictionary itself
+    - #1 - the DICTIONARY is the 4 byte ID (big-endian) of a dictionary in LIGHT_ARCHIVE_DICTIONARY_STORE_DIR
+    The CODEC element then holds the zstd dictionary CODEC HEADER. Each file still decompresses on its own
+    ^(many small files compress several times better with a dictionary learned from all of them)
+
     The unpacker reads data from left to right. If it finds a folder => it automatically considers all next elements to be inside it
     ^(this is why GO_UPS is necessary)
     The archive has folders always sorted to be LAST
@@ -69,15 +86,22 @@ This file contains functions regarding "Light Archives".
 # And a setting for the chunk size
 # This should be EASIER than making the archive format handling itself
 
-from typing import Collection
-from io import BufferedWriter, BufferedReader
+from typing import BinaryIO, Collection, Iterable, Iterator
+from io import BufferedReader
 from enum import Enum
 import copy
+import itertools
 import math
 import os
 import shutil
 from pathlib import Path
 from settings import (
+    ARCHIVE_SPILL_THRESHOLD_BYTES,
+    COMPRESSION_PROBE,
+    LIGHT_ARCHIVE_DICTIONARY_SAMPLE_FILE_BYTES,
+    LIGHT_ARCHIVE_DICTIONARY_SAMPLE_FILES,
+    LIGHT_ARCHIVE_DICTIONARY_SIZE_BYTES,
+    LIGHT_ARCHIVE_DICTIONARY_STORE_DIR,
     LIGHT_ARCHIVE_UNPACK_EXPECTED_MAX_ENCODED_INT_BYTES,
     LIGHT_ARCHIVE_UNPACK_EXPECTED_MAX_NAME_BYTES,
     COPY_BLOCK_SIZE_BYTES,
@@ -91,6 +115,17 @@ from filesystem_helpers import (
     get_nonexistent_paths,
     get_non_children_paths,
     ensure_file_not_exist,
+    open_mapped,
+)
+from compression_helpers import (
+    CODEC_HEADER_LENGTH,
+    CompressibilityProbe,
+    compress_stream,
+    decompress_stream,
+    get_codec_header,
+    get_zstd_dictionary_id,
+    probe_compressibility,
+    train_zstd_dictionary,
 )
 from number_base_helpers import as_base
 from data_helpers import pad_list_from_left
@@ -109,12 +144,21 @@ class UnpackedType(Enum):
     DIR = "dir"
 
 
+class DictionaryMode(Enum):
+    NONE = "none"
+    EMBEDDED = "embedded"  # Stored in the archive
+    STORED = "stored"  # Kept in the local store, the archive only refers to it
+
+
 STRUCTURE_ROOT_KEY: Path = Path("ROOT")
 # DO NOT CHANGE!
 _NAME_TERMINATOR_0: bytes = b"\x00"
 _NAME_TERMINATOR_0_DECODED: str = _NAME_TERMINATOR_0.decode("utf-8")
 _NAME_TERMINATOR_1: bytes = b"\x2F"  # Terminator 1 is an utf-8 ASCII '\' character
 _NAME_TERMINATOR_1_DECODED: str = _NAME_TERMINATOR_1.decode("utf-8")
+_DICTIONARY_KIND_EMBEDDED: int = 0
+_DICTIONARY_KIND_STORED: int = 1
+_DICTIONARY_ID_LENGTH: int = 4
 
 
 def make_light_archive(
@@ -122,6 +166,9 @@ def make_light_archive(
     input_directory: Path,
     input_elements: Collection[Path],
     debug_archive_id: int | None = None,
+    codec: str = "none",
+    level: int | None = None,
+    dictionary_mode: DictionaryMode = DictionaryMode.NONE,
 ) -> None:
     # Archive IDs are only used for debugging purposes
     archive_id: int
@@ -134,10 +181,24 @@ def make_light_archive(
 
     ensure_file_not_exist(destination)
     with open(destination, "wb") as dest:
-        structure: ArchiveStructure = get_structure(
-            input_directory, input_elements, archive_id
-        )
-        write_archive_from_structure(dest, structure, archive_id)
+        write_light_archive(dest, input_directory, input_elements, archive_id, codec, level, dictionary_mode)
+
+
+def write_light_archive(
+    dest: BinaryIO,
+    input_directory: Path,
+    input_elements: Collection[Path],
+    archive_id: int = 0,
+    codec: str = "none",
+    level: int | None = None,
+    dictionary_mode: DictionaryMode = DictionaryMode.NONE,
+) -> None:
+    # The archive is written front to back without seeking, so dest can be any stream
+    # (e.g. a SpooledTemporaryFile, or a compressing writer chained into the encoder)
+    structure: ArchiveStructure = get_structure(input_directory, input_elements, archive_id)
+    # The elements are the root of the archive, not the input directory itself
+    root_structure: ArchiveStructure = {STRUCTURE_ROOT_KEY: structure[input_directory]}
+    write_archive_from_structure(dest, root_structure, archive_id, codec, level, dictionary_mode)
 
 
 def new_archive_id() -> int:
@@ -204,7 +265,12 @@ def get_structure(
 
 
 def write_archive_from_structure(
-    dest: BufferedWriter, structure: ArchiveStructure, archive_id: int = 0
+    dest: BinaryIO,
+    structure: ArchiveStructure,
+    archive_id: int = 0,
+    codec: str = "none",
+    level: int | None = None,
+    dictionary_mode: DictionaryMode = DictionaryMode.NONE,
 ) -> None:
     logs_infix: str = f"{write_archive_from_structure.__name__}{s}{archive_id}{s}"
     l.debug(f"{logs_infix}Beginning writing to light archive...")
@@ -220,10 +286,99 @@ def write_archive_from_structure(
     )
 
     root_children: ArchiveChildren = structure[STRUCTURE_ROOT_KEY]
-    write_encoded_children_bytes(dest, root_children, archive_id)
+    dictionary: bytes | None = None
+    if dictionary_mode != DictionaryMode.NONE:
+        if codec != "zstd":
+            raise RuntimeError(
+                f"{LOGS_ERROR_GENERIC_PREFIX}{s}{logs_infix}Codec: {codec}{s}Dictionaries need the zstd codec!"
+            )
+        dictionary = train_archive_dictionary(root_children, archive_id)
+    if codec != "none":
+        write_encoded_codec_bytes(dest, get_codec_header(codec, dictionary), archive_id)
+    if dictionary is not None:
+        write_encoded_dictionary_bytes(dest, dictionary, dictionary_mode, archive_id)
+    write_encoded_children_bytes(dest, root_children, archive_id, codec, level, dictionary)
     l.debug(f"{logs_infix}Finished writing to light archive...")
 
 
+def iter_structure_files(children: ArchiveChildren) -> Iterator[Path]:
+    # Careful! This function is recursive
+    yield from children[0]
+    for sub_children in children[1].values():
+        yield from iter_structure_files(sub_children)
+
+
+def train_archive_dictionary(children: ArchiveChildren, archive_id: int = 0) -> bytes | None:
+    # Trained on the beginnings of up to LIGHT_ARCHIVE_DICTIONARY_SAMPLE_FILES files, spread evenly over the archive
+    logs_infix: str = f"{train_archive_dictionary.__name__}{s}{archive_id}{s}"
+    files: list[Path] = list(iter_structure_files(children))
+    step: float = max(1.0, len(files) / LIGHT_ARCHIVE_DICTIONARY_SAMPLE_FILES)
+    sampled_count: int = min(len(files), LIGHT_ARCHIVE_DICTIONARY_SAMPLE_FILES)
+    sampled_files: list[Path] = [files[int(i * step)] for i in range(sampled_count)]
+    samples: list[bytes] = []
+    for file in sampled_files:
+        with open(file, "rb") as f:
+            sample: bytes = f.read(LIGHT_ARCHIVE_DICTIONARY_SAMPLE_FILE_BYTES)
+        if sample:
+            samples.append(sample)
+    l.debug(f"{logs_infix}Files: {len(files)}{s}Sampled: {len(samples)}")
+    return train_zstd_dictionary(samples, LIGHT_ARCHIVE_DICTIONARY_SIZE_BYTES)
+
+
+def write_encoded_codec_bytes(dest: BinaryIO, codec_header: int, archive_id: int = 0) -> None:
+    l.debug(f"{write_encoded_codec_bytes.__name__}{s}{archive_id}{s}Codec Header: {codec_header}")
+    dest.write(_NAME_TERMINATOR_1 + bytes([codec_header]))
+
+
+def write_encoded_dictionary_bytes(
+    dest: BinaryIO, dictionary: bytes, dictionary_mode: DictionaryMode, archive_id: int = 0
+) -> None:
+    logs_infix: str = f"{write_encoded_dictionary_bytes.__name__}{s}{archive_id}{s}Mode: {dictionary_mode.value}{s}"
+    body: bytes
+    if dictionary_mode == DictionaryMode.EMBEDDED:
+        body = bytes([_DICTIONARY_KIND_EMBEDDED]) + dictionary
+    elif dictionary_mode == DictionaryMode.STORED:
+        dictionary_id: int = get_zstd_dictionary_id(dictionary)
+        save_stored_dictionary(dictionary_id, dictionary)
+        body = bytes([_DICTIONARY_KIND_STORED]) + dictionary_id.to_bytes(_DICTIONARY_ID_LENGTH, "big")
+    else:
+        raise RuntimeError(f"{LOGS_ERROR_GENERIC_PREFIX}{s}{logs_infix}Unsupported dictionary mode!")
+    l.debug(f"{logs_infix}{len(body)} bytes")
+    dest.write(_NAME_TERMINATOR_0 + get_encoded_int(len(body)) + body)
+
+
+def get_stored_dictionary_path(dictionary_id: int) -> Path:
+    return Path(LIGHT_ARCHIVE_DICTIONARY_STORE_DIR).expanduser() / f"{dictionary_id:08x}.zdict"
+
+
+def save_stored_dictionary(dictionary_id: int, dictionary: bytes) -> None:
+    # Trained IDs are random, so a different dictionary under the same ID is a clash, not an update
+    path: Path = get_stored_dictionary_path(dictionary_id)
+    if path.exists():
+        if path.read_bytes() != dictionary:
+            raise RuntimeError(
+                f"{LOGS_ERROR_GENERIC_PREFIX}{s}{save_stored_dictionary.__name__}{s}{path}"
+                f"{s}A different dictionary with this ID is already stored!"
+            )
+        return
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_bytes(dictionary)
+
+
+def load_stored_dictionary(dictionary_id: int, archive_name: str = unknown_name) -> bytes:
+    logs_infix: str = f"{load_stored_dictionary.__name__}{s}Name: {archive_name}{s}ID: {dictionary_id:08x}{s}"
+    path: Path = get_stored_dictionary_path(dictionary_id)
+    if not path.exists():
+        raise RuntimeError(
+            f"{LOGS_ERROR_GENERIC_PREFIX}{s}{logs_infix}{path}{s}The archive's dictionary isn't in your store!"
+            f"{s}Tip: Copy it from the machine that made the archive"
+        )
+    dictionary: bytes = path.read_bytes()
+    if get_zstd_dictionary_id(dictionary) != dictionary_id:
+        raise RuntimeError(f"{LOGS_ERROR_GENERIC_PREFIX}{s}{logs_infix}{path}{s}The stored dictionary has a different ID!")
+    return dictionary
+
+
 def check_structure_has_root(structure: ArchiveStructure) -> bool:
     return STRUCTURE_ROOT_KEY in structure.keys()
 
@@ -233,7 +388,12 @@ def check_structure_roots_count(structure: ArchiveStructure) -> bool:
 
 
 def write_encoded_children_bytes(
-    dest: BufferedWriter, children: ArchiveChildren, archive_id: int
+    dest: BinaryIO,
+    children: ArchiveChildren,
+    archive_id: int,
+    codec: str = "none",
+    level: int | None = None,
+    dictionary: bytes | None = None,
 ) -> int:  # -> created_depth
     # Careful! This function is recursive
     logs_infix: str = f"{write_encoded_children_bytes.__name__}{s}{archive_id}{s}"
@@ -241,22 +401,29 @@ def write_encoded_children_bytes(
     files: Collection[Path] = children[0]
     for file in files:
         l.debug(f"{logs_infix}Encoding and writing bytes of file {file}")
-        write_encoded_file_bytes(dest, file, archive_id)
+        write_encoded_file_bytes(dest, file, archive_id, codec, level, dictionary)
 
     created_depth: int = 0
 
     dirs: ArchiveStructure = children[1]
     for dir, children in dirs.items():
         l.debug(f"{logs_infix}Encoding and writing bytes of dir {dir}")
-        write_encoded_dir_bytes(dest, dir, created_depth, archive_id)
-        created_depth = write_encoded_children_bytes(dest, children, archive_id)
+        write_encoded_dir_bytes(dest, dir.name, created_depth, archive_id)
+        created_depth = write_encoded_children_bytes(dest, children, archive_id, codec, level, dictionary)
         # The created depth from one call goes to the go ups of the next call
 
     created_depth = created_depth + 1
     return created_depth
 
 
-def write_encoded_file_bytes(dest: BufferedWriter, path: Path, archive_id: int):
+def write_encoded_file_bytes(
+    dest: BinaryIO,
+    path: Path,
+    archive_id: int,
+    codec: str = "none",
+    level: int | None = None,
+    dictionary: bytes | None = None,
+):
     # Note: Files don't need going up due to how the archive works
     logs_infix: str = f"{write_encoded_file_bytes.__name__}{s}{archive_id}{s}"
     l.debug(f"{logs_infix}Getting file bytes")
@@ -276,9 +443,6 @@ def write_encoded_file_bytes(dest: BufferedWriter, path: Path, archive_id: int):
             f"{LOGS_ERROR_GENERIC_PREFIX}{s}{logs_infix}Filename cannot contain Terminator #1: {_NAME_TERMINATOR_1_DECODED}"
         )
 
-    size: int = os.path.getsize(path)
-    size_encoded: bytes = get_encoded_int(size)
-
     name_bytes: bytes = name.encode("utf-8")
     name_bytes_len: int = len(name_bytes)
     if name_bytes_len > expected_max_bytes:
@@ -288,14 +452,48 @@ def write_encoded_file_bytes(dest: BufferedWriter, path: Path, archive_id: int):
             f"{s}This archive may be unpackable for you now. Adjust your setting to at least {name_bytes_len}!"
         )
 
-    dest.write(name_bytes + _NAME_TERMINATOR_0 + size_encoded)
-
     with open(path, "rb") as f:
+        size: int = os.path.getsize(path)
+        file_codec: str = get_file_codec(f, codec)
+        if file_codec != "none":
+            from tempfile import SpooledTemporaryFile
+
+            # LENGTH goes before the DATA, so the compressed file is gathered first
+            # Like archives, it stays in memory until it grows past ARCHIVE_SPILL_THRESHOLD_BYTES
+            with SpooledTemporaryFile(max_size=ARCHIVE_SPILL_THRESHOLD_BYTES) as compressed:
+                blocks: Iterator[bytes] = iter(lambda: f.read(COPY_BLOCK_SIZE_BYTES), b"")
+                for part in compress_stream(blocks, file_codec, level, dictionary):
+                    compressed.write(part)
+                # The CODEC HEADER is in the CODEC element already
+                compressed_size: int = compressed.tell() - CODEC_HEADER_LENGTH
+                l.debug(f"{logs_infix}{name}{s}Codec: {file_codec}{s}Compressed into {compressed_size} bytes")
+                # Tiny files can grow from the codec's own framing
+                if compressed_size < size:
+                    dest.write(name_bytes + _NAME_TERMINATOR_0 + get_encoded_int(compressed_size * 2 + 1))
+                    compressed.seek(CODEC_HEADER_LENGTH)
+                    shutil.copyfileobj(compressed, dest, length=COPY_BLOCK_SIZE_BYTES)
+                    return
+            f.seek(0)
+
+        # Only archives with a CODEC element have the IS COMPRESSED bit
+        encoded_length: int = size if codec == "none" else size * 2
+        dest.write(name_bytes + _NAME_TERMINATOR_0 + get_encoded_int(encoded_length))
         shutil.copyfileobj(f, dest, length=COPY_BLOCK_SIZE_BYTES)
 
 
+def get_file_codec(file: BinaryIO, codec: str) -> str:
+    # The codec for a single file: "none" when the probe finds the file won't shrink
+    # The file is probed through a mapping, so only the sampled pages are read. It's rewound afterwards
+    if codec == "none" or not COMPRESSION_PROBE:
+        return codec
+    with open_mapped(file) as data:
+        probe: CompressibilityProbe = probe_compressibility(data)
+    file.seek(0)
+    return codec if probe.is_compressible else "none"
+
+
 def write_encoded_dir_bytes(
-    dest: BufferedWriter, name: str, go_up: int, archive_id: int
+    dest: BinaryIO, name: str, go_up: int, archive_id: int
 ) -> None:
     logs_infix: str = f"{write_encoded_dir_bytes.__name__}{s}{archive_id}{s}"
 
@@ -372,10 +570,140 @@ def unpack_light_archive(archive: Path, dest: Path) -> None:
         os.mkdir(dest)
 
     with open(archive, "rb") as f:
-        # DEV
-        print("-" * 50)
-        print(unpack_structure(f, archive.name))
-        pass
+        extract_light_archive(f, dest, archive.name)
+
+
+def extract_light_archive(
+    archive: BufferedReader, dest: Path, archive_name: str = unknown_name
+) -> None:
+    # Elements are created as they're read, in a single pass. The archive is never sought,
+    # so it can come straight from a stream (e.g. text that's being decoded) without an intermediate file
+    archive_name_infix: str = f"Name: {archive_name}{s}"
+    logs_infix: str = f"{extract_light_archive.__name__}{s}{archive_name_infix}"
+    tip_postfix: str = f"{s}Tip: Your archive may be invalid"
+    l.debug(f"{logs_infix}Extracting into {dest}")
+
+    dest.mkdir(parents=True, exist_ok=True)
+    # Only the CODEC and DICTIONARY elements start with a terminator
+    codec_header: bytes | None = None
+    if archive.peek(1)[:1] == _NAME_TERMINATOR_1:
+        archive.read(1)
+        codec_header = unpack_codec_header(archive, archive_name)
+    dictionary: bytes | None = None
+    if archive.peek(1)[:1] == _NAME_TERMINATOR_0:
+        archive.read(1)
+        dictionary = unpack_dictionary(archive, archive_name)
+    # The directories entered so far. The root must never be left
+    scope: list[Path] = [dest]
+    while archive.peek(1):
+        name, type = unpack_identify_element(archive, archive_name)
+        ensure_safe_element_name(name, archive_name)
+        if type == UnpackedType.FILE:
+            length: int = unpack_decode_next_int(archive, archive_name)
+            is_compressed: bool = False
+            if codec_header is not None:
+                length, is_compressed = length // 2, bool(length % 2)
+            path: Path = scope[-1] / name
+            l.debug(
+                f"{logs_infix}Type: {UnpackedType.FILE.value}{s}Path: {path}{s}Length: {length}{s}Compressed: {is_compressed}"
+            )
+            payload: _ExactLengthReader = _ExactLengthReader(archive, length)
+            parts: Iterable[bytes] = payload
+            if codec_header is not None and is_compressed:
+                parts = decompress_stream(itertools.chain([codec_header], payload), dictionary)
+            # "x" - never overwrite what's already there
+            with open(path, "xb") as f:
+                for part in parts:
+                    f.write(part)
+            if payload.remaining:
+                raise RuntimeError(
+                    f"{LOGS_ERROR_GENERIC_PREFIX}{s}{logs_infix}{path}{s}Expected {length} bytes, got {length - payload.remaining}"
+                    f"{s}Reached EOF in file data!{tip_postfix}"
+                )
+        elif type == UnpackedType.DIR:
+            go_ups: int = unpack_decode_next_int(archive, archive_name)
+            if go_ups >= len(scope):
+                raise RuntimeError(
+                    f"{LOGS_ERROR_GENERIC_PREFIX}{s}{logs_infix}Archive cannot have negative depth!"
+                    f"{s}GO_UPS: {go_ups}{s}Depth: {len(scope) - 1}{tip_postfix}"
+                )
+            if go_ups != 0:
+                del scope[-go_ups:]
+            path = scope[-1] / name
+            l.debug(f"{logs_infix}Type: {UnpackedType.DIR.value}{s}Path: {path}{s}Go Ups: {go_ups}")
+            path.mkdir(exist_ok=True)
+            scope.append(path)
+        else:
+            raise RuntimeError(
+                f"{LOGS_ERROR_GENERIC_PREFIX}{s}{logs_infix}{type}{s}Unsupported element type!"
+            )
+    l.debug(f"{logs_infix}Finished extracting (EOF)")
+
+
+def unpack_codec_header(archive: BinaryIO, archive_name: str = unknown_name) -> bytes:
+    # Reads the rest of the CODEC element (after its terminator). The codec itself is checked when decompressing
+    codec_header: bytes = archive.read(CODEC_HEADER_LENGTH)
+    if len(codec_header) != CODEC_HEADER_LENGTH:
+        raise RuntimeError(
+            f"{LOGS_ERROR_GENERIC_PREFIX}{s}{unpack_codec_header.__name__}{s}Name: {archive_name}"
+            f"{s}Reached EOF in the codec element!{s}Tip: Your archive may be invalid"
+        )
+    l.debug(f"{unpack_codec_header.__name__}{s}Name: {archive_name}{s}Codec Header: {codec_header[0]}")
+    return codec_header
+
+
+def unpack_dictionary(archive: BinaryIO, archive_name: str = unknown_name) -> bytes:
+    # Reads the rest of the DICTIONARY element (after its terminator)
+    logs_infix: str = f"{unpack_dictionary.__name__}{s}Name: {archive_name}{s}"
+    tip_postfix: str = f"{s}Tip: Your archive may be invalid"
+    length: int = unpack_decode_next_int(archive, archive_name)
+    body: bytes = archive.read(length)
+    if not body or len(body) != length:
+        raise RuntimeError(
+            f"{LOGS_ERROR_GENERIC_PREFIX}{s}{logs_infix}Expected {length} bytes, got {len(body)}"
+            f"{s}Invalid dictionary element!{tip_postfix}"
+        )
+    kind: int = body[0]
+    if kind == _DICTIONARY_KIND_EMBEDDED:
+        l.debug(f"{logs_infix}Embedded dictionary{s}{length - 1} bytes")
+        return body[1:]
+    if kind == _DICTIONARY_KIND_STORED and length == 1 + _DICTIONARY_ID_LENGTH:
+        dictionary_id: int = int.from_bytes(body[1:], "big")
+        l.debug(f"{logs_infix}Stored dictionary{s}ID: {dictionary_id:08x}")
+        return load_stored_dictionary(dictionary_id, archive_name)
+    raise RuntimeError(
+        f"{LOGS_ERROR_GENERIC_PREFIX}{s}{logs_infix}Kind: {kind}{s}Length: {length}"
+        f"{s}Unsupported dictionary element!{tip_postfix}"
+    )
+
+
+def ensure_safe_element_name(name: str, archive_name: str = unknown_name) -> None:
+    # Names come from the archive, so they must not be able to point outside of the current directory
+    logs_infix: str = f"{ensure_safe_element_name.__name__}{s}Name: {archive_name}{s}"
+    separators: list[str] = [sep for sep in (os.sep, os.altsep) if sep]
+    if name in (os.curdir, os.pardir) or any(sep in name for sep in separators):
+        raise RuntimeError(
+            f"{LOGS_ERROR_GENERIC_PREFIX}{s}{logs_infix}{name!r}{s}Unsafe element name!"
+            f"{s}Tip: Your archive may be invalid"
+        )
+
+
+class _ExactLengthReader:
+    # Iterates over the next `length` bytes of the source in blocks. Stops early only at EOF
+    source: BinaryIO
+    remaining: int
+
+    def __init__(self, source: BinaryIO, length: int) -> None:
+        self.source = source
+        self.remaining = length
+
+    def __iter__(self) -> Iterator[bytes]:
+        while self.remaining > 0:
+            block: bytes = self.source.read(min(COPY_BLOCK_SIZE_BYTES, self.remaining))
+            if not block:
+                return
+            self.remaining -= len(block)
+            yield block
 
 
 def unpack_structure(
@@ -469,7 +797,7 @@ def unpack_flatten_structure(
 
 
 def unpack_identify_element(
-    archive: BufferedReader, archive_name: str = unknown_name
+    archive: BinaryIO, archive_name: str = unknown_name
 ) -> tuple[str, UnpackedType]:
     # This function also moves the pointer of the archive to the beginning of the DATA
     archive_name_infix: str = f"Name: {archive_name}{s}"
@@ -517,7 +845,7 @@ def unpack_identify_element(
 
 
 def unpack_decode_next_int(
-    archive: BufferedReader, archive_name: str = unknown_name
+    archive: BinaryIO, archive_name: str = unknown_name
 ) -> int:
     # This function does not need to be fast. For every element in the archive there should be
     # one encoded int that's most likely going to be 1-10 bytes long (very short)
@@ -1,24 +1,143 @@
 """This file is the heart of the program. This file controls the flow of the entire program at a high level"""
-import shutil
+import argparse
 import sys
-from cli_helpers import get_zip_target
-from number_base_helpers import as_high_base
-from settings import RECURSION_LIMIT
+from typing import BinaryIO, Iterator, TextIO
+from collections.abc import Buffer
+from contextlib import ExitStack
+from io import BufferedReader, StringIO
+from pathlib import Path
+from archive_helpers import (
+    ZIP_SIGNATURE_LENGTH,
+    extract_zip_archive,
+    get_is_zip_archive,
+    make_zip_archive,
+    open_archive_buffer,
+)
+from cli_helpers import (
+    STANDARD_STREAM_PATH,
+    copy_to_clipboard,
+    get_arguments,
+    get_zip_target,
+    open_binary_output,
+    open_clipboard_input,
+    open_text_input,
+    open_text_output,
+    print_estimate,
+)
+from compression_helpers import (
+    AUTO_CODEC,
+    CompressibilityProbe,
+    pick_codec,
+    probe_compressibility,
+    read_sample,
+)
+from number_base_helpers import (
+    HighBaseMode,
+    TransportSink,
+    estimate_high_base,
+    iter_decode_high_base,
+    iter_encode_high_base,
+    pick_alphabet_profile,
+)
+from data_helpers import open_parts_reader
+from light_archiver import extract_light_archive
+from parallel_helpers import get_workers_count
+from pipeline_helpers import get_is_pipeline_supported, write_high_base_pipelined
+from settings import COMPRESSION_PROBE, COMPRESSION_PROBE_SAMPLE_BYTES, RECURSION_LIMIT
 
 
 def main() -> None:
     sys.setrecursionlimit(RECURSION_LIMIT)
+    arguments: argparse.Namespace = get_arguments()
+    if arguments.command == "decode":
+        decode(arguments)
+    else:
+        encode(arguments)
 
-    zipping_target: str = get_zip_target()
-    zip_basename: str = zipping_target
-    zip_path: str = shutil.make_archive(base_name=zip_basename, format='zip', root_dir='.', base_dir=zipping_target,)
 
-    with open(zip_path, 'rb') as f:
-        file_bytes: bytes = f.read()
+def encode(arguments: argparse.Namespace) -> None:
+    mode: HighBaseMode = HighBaseMode(arguments.mode)
+    profile: str = arguments.profile
+    codec: str = arguments.codec
+    level: int | None = arguments.level
+    if arguments.sink is not None:
+        sink: TransportSink = TransportSink(arguments.sink)
+        profile, transport_cost = pick_alphabet_profile(sink, mode)
+        print(f'Alphabet profile: {profile} (~{transport_cost:.3f} {sink.value} units per input byte)', file=sys.stderr)
 
-    file_int: int = int.from_bytes(file_bytes, byteorder='big')
-    high_base: str = as_high_base(file_int)
-    print(high_base)
+    with ExitStack() as stack:
+        # Text and stdin are encoded as they are. Files and directories are archived together first
+        source: BinaryIO | Buffer
+        if arguments.text is not None:
+            source = arguments.text.encode('utf-8')
+        elif arguments.targets == [STANDARD_STREAM_PATH]:
+            source = sys.stdin.buffer
+        else:
+            targets: list[str] = arguments.targets or [get_zip_target()]
+            archive = stack.enter_context(make_zip_archive(targets))
+            source = stack.enter_context(open_archive_buffer(archive))
+
+        if codec != "none" and COMPRESSION_PROBE:
+            probe_sample: bytes
+            probe_sample, source = read_sample(source, COMPRESSION_PROBE_SAMPLE_BYTES)
+            probe: CompressibilityProbe = probe_compressibility(probe_sample)
+            if not probe.is_compressible:
+                codec = "none"
+                print(f'Codec: none (the data looks incompressible, {probe.entropy:.2f} bits per byte)', file=sys.stderr)
+
+        if codec == AUTO_CODEC:
+            sample: bytes
+            sample, source = read_sample(source)
+            codec, level, ratio = pick_codec(sample)
+            print(f'Codec: {codec} level {level} (~{ratio:.3f} of the size on a sample)', file=sys.stderr)
+
+        if arguments.dry_run:
+            data: Buffer = source if isinstance(source, Buffer) else source.read()
+            print_estimate(estimate_high_base(data, mode, profile, codec, level))
+            return
+
+        output: TextIO
+        if arguments.clipboard:
+            # The clipboard takes whole texts, so this one is gathered in memory first
+            output = StringIO()
+        else:
+            output = stack.enter_context(open_text_output(arguments.output))
+        if get_is_pipeline_supported(mode):
+            # Reading, encoding and writing overlap, and only a few chunks are held at a time
+            write_high_base_pipelined(source, output, mode, profile, codec, level)
+        else:
+            for high_base_part in iter_encode_high_base(source, mode, profile, codec, level):
+                output.write(high_base_part)
+        if isinstance(output, StringIO):
+            copy_to_clipboard(output.getvalue(), arguments.parts)
+        elif arguments.output == STANDARD_STREAM_PATH:
+            output.write('\n')
+
+
+def decode(arguments: argparse.Namespace) -> None:
+    with ExitStack() as stack:
+        source: TextIO
+        if arguments.clipboard:
+            source = stack.enter_context(open_clipboard_input())
+        else:
+            source = stack.enter_context(open_text_input(arguments.source))
+        # Parts are validated and decoded as the text is read, and written or extracted as they come
+        # Files and the clipboard can be read whole, so there the blocks mode is decoded in many processes
+        is_parallel: bool = get_workers_count() > 1 and (arguments.clipboard or arguments.source != STANDARD_STREAM_PATH)
+        decoded_parts: Iterator[bytes] = iter_decode_high_base(source, is_parallel)
+
+        if arguments.extract is None:
+            output: BinaryIO = stack.enter_context(open_binary_output(arguments.output))
+            for decoded_part in decoded_parts:
+                output.write(decoded_part)
+            return
+
+        payload: BufferedReader = stack.enter_context(open_parts_reader(decoded_parts))
+        if get_is_zip_archive(payload.peek(ZIP_SIGNATURE_LENGTH)):
+            extract_zip_archive(payload, arguments.extract)
+        else:
+            # Light archives are read front to back, so they're extracted straight from the decoded stream
+            extract_light_archive(payload, Path(arguments.extract))
 
 
 
@@ -39,4 +158,6 @@ def testanotherthing():
 # print(as_base(1, 11))
 # print(chr(n))
 # print("TESTING up,down")
-main()
+# Worker processes import this file too (they aren't forked), so the program only runs when it's started
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+"""This file contains functions for sending encoded text in several parts (e.g. through a size-limited clipboard) and putting it back together"""
+
+from typing import NamedTuple
+import math
+import re
+import zlib
+from settings import CLIPBOARD_PART_MAX_SIGNS, LOGS_ERROR_GENERIC_PREFIX, LOGS_SEPARATOR as s
+from Logger import logger as l
+
+
+# Layout of every part: [ PART HEADER ] ( SIGNS )
+# PART HEADER is plain ASCII: "texter-part <INDEX>/<TOTAL> <TRANSFER ID> <CHECKSUM>|"
+# INDEX is 1-based. TRANSFER ID is the CRC32 of the whole text, so parts of different texts are never mixed
+# CHECKSUM is the CRC32 of this part's SIGNS (as UTF-8), so a damaged part can be sent again on its own
+# Encoded texts never start with "texter-part", so a single-part text is sent without any header
+PART_PREFIX: str = "texter-part "
+_PART_HEADER_PATTERN: re.Pattern[str] = re.compile(
+    rf"{re.escape(PART_PREFIX)}(\d+)/(\d+) ([0-9a-f]{{8}}) ([0-9a-f]{{8}})\|"
+)
+
+
+class PartHeader(NamedTuple):
+    part_index: int
+    total: int
+    transfer_id: int
+    checksum: int
+
+
+def get_checksum(text: str) -> int:
+    return zlib.crc32(text.encode("utf-8"))
+
+
+def get_is_part(text: str) -> bool:
+    return text.startswith(PART_PREFIX)
+
+
+def split_into_parts(text: str, max_signs: int = CLIPBOARD_PART_MAX_SIGNS) -> list[str]:
+    # Headers aren't counted into max_signs. They're a few dozen ASCII characters
+    logs_infix: str = f"{split_into_parts.__name__}{s}Length: {len(text)}{s}"
+    if max_signs <= 0:
+        raise RuntimeError(
+            f"{LOGS_ERROR_GENERIC_PREFIX}{s}{logs_infix}Max Signs: {max_signs}{s}Parts must hold at least one sign!"
+        )
+    total: int = max(1, math.ceil(len(text) / max_signs))
+    transfer_id: int = get_checksum(text)
+    parts: list[str] = []
+    for index in range(1, total + 1):
+        signs: str = text[(index - 1) * max_signs : index * max_signs]
+        header: PartHeader = PartHeader(index, total, transfer_id, get_checksum(signs))
+        parts.append(get_part_header_text(header) + signs)
+    l.debug(f"{logs_infix}Split into {total} parts")
+    return parts
+
+
+def get_part_header_text(header: PartHeader) -> str:
+    return f"{PART_PREFIX}{header.part_index}/{header.total} {header.transfer_id:08x} {header.checksum:08x}|"
+
+
+def parse_part(part: str) -> tuple[PartHeader, str]:
+    # Raises if the header is damaged or the signs don't match their checksum
+    logs_infix: str = f"{parse_part.__name__}{s}"
+    tip_postfix: str = f"{s}Tip: Copy this part again"
+    match: re.Match[str] | None = _PART_HEADER_PATTERN.match(part)
+    if match is None:
+        raise RuntimeError(f"{LOGS_ERROR_GENERIC_PREFIX}{s}{logs_infix}Invalid part header!{tip_postfix}")
+
+    index, total, transfer_id, checksum = match.groups()
+    header: PartHeader = PartHeader(int(index), int(total), int(transfer_id, 16), int(checksum, 16))
+    if not 1 <= header.part_index <= header.total:
+        raise RuntimeError(
+            f"{LOGS_ERROR_GENERIC_PREFIX}{s}{logs_infix}Part: {header.part_index}/{header.total}"
+            f"{s}Part index out of range!{tip_postfix}"
+        )
+    signs: str = part[match.end() :]
+    actual_checksum: int = get_checksum(signs)
+    if actual_checksum != header.checksum:
+        raise RuntimeError(
+            f"{LOGS_ERROR_GENERIC_PREFIX}{s}{logs_infix}Part: {header.part_index}/{header.total}"
+            f"{s}Expected: {header.checksum:08x}{s}Got: {actual_checksum:08x}{s}Checksum mismatch!{tip_postfix}"
+        )
+    return header, signs
+
+
+class PartsCollector:
+    # Gathers parts of a single text in any order. Repeated parts are ignored
+    total: int | None
+    transfer_id: int | None
+    parts: dict[int, str]
+
+    def __init__(self) -> None:
+        self.total = None
+        self.transfer_id = None
+        self.parts = {}
+
+    def add(self, part: str) -> PartHeader:
+        header, signs = parse_part(part)
+        logs_infix: str = f"{PartsCollector.__name__}{s}Part: {header.part_index}/{header.total}{s}"
+        if self.transfer_id is None:
+            self.total = header.total
+            self.transfer_id = header.transfer_id
+        elif header.transfer_id != self.transfer_id or header.total != self.total:
+            raise RuntimeError(
+                f"{LOGS_ERROR_GENERIC_PREFIX}{s}{logs_infix}Transfer: {header.transfer_id:08x}"
+                f"{s}Expected: {self.transfer_id:08x}{s}This part belongs to a different text!"
+            )
+        self.parts[header.part_index] = signs
+        l.debug(f"{logs_infix}Collected {len(self.parts)} parts")
+        return header
+
+    def get_missing_indices(self) -> list[int]:
+        if self.total is None:
+            return []
+        return [index for index in range(1, self.total + 1) if index not in self.parts]
+
+    def get_is_complete(self) -> bool:
+        return self.total is not None and not self.get_missing_indices()
+
+    def join(self) -> str:
+        logs_infix: str = f"{PartsCollector.__name__}{s}"
+        missing_indices: list[int] = self.get_missing_indices()
+        if self.total is None or missing_indices:
+            raise RuntimeError(
+                f"{LOGS_ERROR_GENERIC_PREFIX}{s}{logs_infix}Missing: {missing_indices or 'all'}"
+                f"{s}Can't join an incomplete text!"
+            )
+        text: str = "".join(self.parts[index] for index in range(1, self.total + 1))
+        if get_checksum(text) != self.transfer_id:
+            raise RuntimeError(
+                f"{LOGS_ERROR_GENERIC_PREFIX}{s}{logs_infix}Joined parts don't match their transfer ID!"
+            )
+        return text
@@ -1,44 +1,1219 @@
 """This file contains functions that are helpful for interacting with number bases"""
 
 
-# from typing import Collection
-from unicode_helpers import ALLOWED_UNICODE_SIGNS
+from typing import Any, BinaryIO, Iterator, MutableSequence, NamedTuple, Sequence, TextIO, cast
+from collections.abc import Buffer
+from types import ModuleType
+from array import array
+from decimal import Decimal, Context, Inexact, MAX_PREC, MAX_EMAX, MIN_EMIN
+from enum import Enum
+from io import BytesIO, StringIO, TextIOBase
+import functools
+import math
+import re
+from unicode_helpers import (
+    get_allowed_unicode_code_points,
+    get_encoded_lengths_counts,
+    get_allowed_unicode_digits_index,
+    get_code_point_digit,
+    CODE_POINTS_TYPECODE,
+    CODE_POINTS_ENCODING,
+    get_invalid_signs_pattern,
+    get_profile_alphabet_size,
+)
+from settings import (
+    HIGH_BASE_BLOCK_SIZE_BYTES,
+    HIGH_BASE_BLOCKS_PER_CHUNK,
+    HIGH_BASE_POWER_OF_TWO_GROUPS_PER_CHUNK,
+    BASE_CONVERSION_LEAF_DIGITS,
+    BASE_CONVERSION_LEAF_BITS,
+    BIG_INT_BACKEND,
+    COPY_BLOCK_SIZE_BYTES,
+    UNICODE_ALPHABET_PROFILE,
+    UNICODE_ALPHABET_PROFILES,
+    LOGS_ERROR_GENERIC_PREFIX,
+    LOGS_SEPARATOR as s,
+)
+from Logger import logger as l
+from data_helpers import open_parts_reader, swap_dict_keys_values
+from compression_helpers import compress, compress_stream, decompress_stream
+
+
+@functools.lru_cache(maxsize=1)
+def get_numpy() -> ModuleType | None:
+    # NumPy is optional. When it's importable, the power of two mode slices the bits into digits
+    # and maps them to code points in a few vectorized steps
+    # Imported on first use - the import alone takes longer than converting a small payload
+    try:
+        import numpy
+    except ImportError:
+        return None
+    return numpy
+
+
+@functools.lru_cache(maxsize=1)
+def get_gmpy2() -> ModuleType | None:
+    # gmpy2 is optional. When it's importable, it's the default big int backend
+    try:
+        import gmpy2  # type: ignore # missing stubs
+    except ImportError:
+        return None
+    return gmpy2
+
+
+_BLOCKS_TIP_POSTFIX: str = f"{s}Tip: Your text may be invalid or made with a different block size"
+
+
+class HighBaseMode(Enum):
+    # Whole payload as one giant number - the densest output
+    INTEGER = "integer"
+    # Every fixed-size block of bytes as a fixed-size group of signs - streamable in linear time
+    BLOCKS = "blocks"
+    # Alphabet trimmed to a power of two, so every sign is a fixed count of bits - no division at all
+    POWER_OF_TWO = "power-of-two"
+
+
+# The first sign of every encoded text tells which mode made it. DO NOT CHANGE!
+_MODE_HEADERS: dict[HighBaseMode, str] = {
+    HighBaseMode.INTEGER: "I",
+    HighBaseMode.BLOCKS: "B",
+    HighBaseMode.POWER_OF_TWO: "P",
+}
+_HEADER_MODES: dict[str, HighBaseMode] = swap_dict_keys_values(_MODE_HEADERS)
+# Texts made with another alphabet profile than "full" start with one more sign, in front of the mode header
+# Headers must be ASCII, so every profile can hold them. DO NOT CHANGE!
+_PROFILE_HEADERS: dict[str, str] = {
+    "bmp-only": "M",
+    "utf8-optimal": "A",
+}
+_HEADER_PROFILES: dict[str, str] = swap_dict_keys_values(_PROFILE_HEADERS)
+# Texts of compressed payloads start with one more sign, in front of everything else. DO NOT CHANGE!
+# Which codec it was is told by the payload itself (see compression_helpers)
+_COMPRESSION_HEADER: str = "Z"
+
+
+class TransportSink(Enum):
+    # What the destination of a text counts. E.g. Android clipboard limits count UTF-16 code units
+    UTF8 = "utf-8"
+    UTF16 = "utf-16"
+    CODE_POINTS = "code-points"
+
+
+# Decimal or gmpy2.mpz, depending on the big int backend
+type BigNumber = Any
+# Where digits are written. Memoryviews cast to CODE_POINTS_TYPECODE let them land straight in a code point buffer
+type DigitsOutput = MutableSequence[int] | memoryview
+
+
+class BigIntBackend:
+    # Carries big numbers through the divide-and-conquer conversion
+    # This one is the pure-Python engine. Big numbers are carried as Decimals, because unlike int,
+    # libmpdec multiplies and divides huge numbers in subquadratic time
+    name: str = "python"
+    # Inexact is trapped, so a precision mistake raises instead of silently producing wrong digits
+    context: Context = Context(prec=MAX_PREC, Emax=MAX_EMAX, Emin=MIN_EMIN, traps=[Inexact])
+
+    def from_small_int(self, number: int) -> BigNumber:
+        return Decimal(number)
+
+    def to_small_int(self, number: BigNumber) -> int:
+        return int(number)
+
+    def from_int(self, number: int) -> BigNumber:
+        # Decimal(int) goes through a quadratic int -> str conversion, so big ints are split by bits first
+        ctx: Context = self.context
+        powers_of_two: dict[int, Decimal] = {}
+
+        def convert(number: int, bits: int) -> Decimal:
+            # Careful! This function is recursive
+            if bits <= BASE_CONVERSION_LEAF_BITS:
+                return Decimal(number)
+
+            low_bits: int = bits // 2
+            high: int = number >> low_bits
+            low: int = number - (high << low_bits)
+            if low_bits not in powers_of_two:
+                powers_of_two[low_bits] = ctx.power(2, low_bits)
+
+            high_decimal: Decimal = convert(high, bits - low_bits)
+            low_decimal: Decimal = convert(low, low_bits)
+            return ctx.add(ctx.multiply(high_decimal, powers_of_two[low_bits]), low_decimal)
+
+        return convert(number, number.bit_length())
+
+    def to_int(self, number: BigNumber) -> int:
+        # int(Decimal) goes through a quadratic str -> int conversion, so big Decimals are split by bits first
+        ctx: Context = self.context
+        powers_of_two: dict[int, Decimal] = {}
+
+        def convert(number: Decimal, bits: int) -> int:
+            # Careful! This function is recursive
+            if bits <= BASE_CONVERSION_LEAF_BITS:
+                return int(number)
+
+            low_bits: int = bits // 2
+            if low_bits not in powers_of_two:
+                powers_of_two[low_bits] = ctx.power(2, low_bits)
+            high, low = ctx.divmod(number, powers_of_two[low_bits])
+
+            high_int: int = convert(high, bits - low_bits)
+            low_int: int = convert(low, low_bits)
+            return (high_int << low_bits) | low_int
+
+        # Upper bound of the bit length, from the count of decimal digits
+        decimal_digits_count: int = number.adjusted() + 1
+        bits: int = math.ceil(decimal_digits_count * math.log2(10))
+        return convert(number, bits)
+
+    def divmod(self, dividend: BigNumber, divisor: BigNumber) -> tuple[BigNumber, BigNumber]:
+        return self.context.divmod(dividend, divisor)
+
+    def multiply(self, a: BigNumber, b: BigNumber) -> BigNumber:
+        return self.context.multiply(a, b)
+
+    def add(self, a: BigNumber, b: BigNumber) -> BigNumber:
+        return self.context.add(a, b)
+
+
+class Gmpy2BigIntBackend(BigIntBackend):
+    # GMP converts between int and mpz in linear time and divides with its own subquadratic divmod
+    name: str = "gmpy2"
+    gmpy2: Any
+
+    def __init__(self) -> None:
+        self.gmpy2 = get_gmpy2()
+        assert self.gmpy2 is not None
+
+    def from_small_int(self, number: int) -> BigNumber:
+        return self.gmpy2.mpz(number)
+
+    def to_small_int(self, number: BigNumber) -> int:
+        return int(number)
+
+    def from_int(self, number: int) -> BigNumber:
+        return self.gmpy2.mpz(number)
+
+    def to_int(self, number: BigNumber) -> int:
+        return int(number)
+
+    def divmod(self, dividend: BigNumber, divisor: BigNumber) -> tuple[BigNumber, BigNumber]:
+        return self.gmpy2.f_divmod(dividend, divisor)
+
+    def multiply(self, a: BigNumber, b: BigNumber) -> BigNumber:
+        return a * b
+
+    def add(self, a: BigNumber, b: BigNumber) -> BigNumber:
+        return a + b
+
+
+_BIG_INT_BACKENDS: dict[str, type[BigIntBackend]] = {
+    BigIntBackend.name: BigIntBackend,
+    Gmpy2BigIntBackend.name: Gmpy2BigIntBackend,
+}
+_big_int_backend: BigIntBackend | None = None
+
+
+def get_big_int_backend() -> BigIntBackend:
+    # Chosen on first use from the BIG_INT_BACKEND setting, unless set_big_int_backend was called
+    global _big_int_backend
+    if _big_int_backend is None:
+        set_big_int_backend(BIG_INT_BACKEND)
+    assert _big_int_backend is not None
+    return _big_int_backend
+
+
+def set_big_int_backend(name: str) -> None:
+    # "auto" picks gmpy2 when it's installed. Naming a backend forces it, so the two can be compared
+    global _big_int_backend
+    logs_infix: str = f"{set_big_int_backend.__name__}{s}{name}{s}"
+
+    if name == "auto":
+        name = Gmpy2BigIntBackend.name if get_gmpy2() is not None else BigIntBackend.name
+    if name not in _BIG_INT_BACKENDS:
+        raise RuntimeError(
+            f"{LOGS_ERROR_GENERIC_PREFIX}{s}{logs_infix}Unknown big int backend! Options: auto, {', '.join(_BIG_INT_BACKENDS)}"
+        )
+    if name == Gmpy2BigIntBackend.name and get_gmpy2() is None:
+        raise RuntimeError(
+            f"{LOGS_ERROR_GENERIC_PREFIX}{s}{logs_infix}gmpy2 isn't installed!"
+        )
+
+    _big_int_backend = _BIG_INT_BACKENDS[name]()
+    l.debug(f"{logs_infix}Selected big int backend")
 
 
 def as_base(number: int, base: int) -> list[int]:
     if number == 0:
         return [number]
 
-    digits: list[int] = []
-    while number != 0:
-        digit = number % base
-        number = number // base
-        digits.append(digit)
-    return list(reversed(digits))
+    digits_count: int = get_digits_count_upper_bound(number, base)
+    digits: list[int] = [0] * digits_count
+    write_digits(digits, number, base, range(base))
+
+    leading_zeros: int = 0
+    while digits[leading_zeros] == 0:
+        leading_zeros += 1
+    del digits[:leading_zeros]
+    return digits
+
+
+def get_digits_count_upper_bound(number: int, base: int) -> int:
+    # Over-estimating by a digit or two is fine - callers strip leading zeros
+    digits_count: int = math.ceil(number.bit_length() / math.log2(base)) + 1
+    return digits_count
+
 
+def write_digits(
+    out: DigitsOutput, number: int, base: int, signs: Sequence[int]
+) -> None:
+    # Fills the whole `out` with digits of the number (zero-padded from the left)
+    # Every digit is written as signs[digit], so the result can be mapped on the fly (e.g. into code points)
+    width: int = len(out)
+    if width <= BASE_CONVERSION_LEAF_DIGITS:
+        _write_leaf_digits(out, 0, number, base, width, signs)
+        return
 
-# def from_base(number: Collection[int], base: int) -> int:
-#     return 0
+    backend: BigIntBackend = get_big_int_backend()
+    base_powers: list[BigNumber] = get_base_powers(backend, base, width)
+    big_number: BigNumber = backend.from_int(number)
+    _write_digits(backend, out, 0, big_number, base, base_powers, width, signs)
 
 
-def as_high_base(number: int) -> str:
-    valid_unicode_signs: tuple[str, ...] = ALLOWED_UNICODE_SIGNS
+def get_base_powers(backend: BigIntBackend, base: int, digits_count: int) -> list[BigNumber]:
+    # Element k is base ** (2 ** k). Only powers that can split a number of this many digits are made
+    base_powers: list[BigNumber] = [backend.from_small_int(base)]
+    while 2 ** len(base_powers) < digits_count:
+        base_powers.append(backend.multiply(base_powers[-1], base_powers[-1]))
+    return base_powers
 
-    base: int = len(valid_unicode_signs)
-    number_as_base_abstract: list[int] = as_base(number, base)
 
-    number_as_base_list: list[str] = []
-    for n in number_as_base_abstract:
-        sign: str = valid_unicode_signs[n]
-        number_as_base_list.append(sign)
+def _write_digits(
+    backend: BigIntBackend,
+    out: DigitsOutput,
+    start: int,
+    number: BigNumber,
+    base: int,
+    base_powers: list[BigNumber],
+    width: int,
+    signs: Sequence[int],
+) -> None:
+    # Careful! This function is recursive
+    # Writes exactly `width` digits of the number (zero-padded from the left) to out[start:start + width]
+    # The number is split by a precomputed power of the base and both halves are converted separately
+    # This keeps the expensive divisions on balanced operands instead of peeling one digit at a time
+    if width <= BASE_CONVERSION_LEAF_DIGITS:
+        _write_leaf_digits(out, start, backend.to_small_int(number), base, width, signs)
+        return
 
-    number_as_base: str = "".join(number_as_base_list)
+    power_index: int = (width - 1).bit_length() - 1
+    low_width: int = 2**power_index
+    high_width: int = width - low_width
+    high, low = backend.divmod(number, base_powers[power_index])
+    _write_digits(backend, out, start, high, base, base_powers, high_width, signs)
+    _write_digits(backend, out, start + high_width, low, base, base_powers, low_width, signs)
+
+
+def _write_leaf_digits(
+    out: DigitsOutput,
+    start: int,
+    number: int,
+    base: int,
+    width: int,
+    signs: Sequence[int],
+) -> None:
+    for i in range(start + width - 1, start - 1, -1):
+        number, digit = divmod(number, base)
+        out[i] = signs[digit]
+
+
+def from_base(digits: Sequence[int], base: int) -> int:
+    number: int = read_digits(digits, base, range(base))
+    return number
+
+
+def read_digits(digits: Sequence[int], base: int, values: Sequence[int]) -> int:
+    # Every element is read as the digit values[element] (e.g. a code point -> digit index)
+    # A negative value marks an element that isn't a valid digit
+    logs_infix: str = f"{read_digits.__name__}{s}"
+
+    width: int = len(digits)
+    if width == 0:
+        raise RuntimeError(
+            f"{LOGS_ERROR_GENERIC_PREFIX}{s}{logs_infix}Cannot read a number from zero digits!"
+        )
+    if width <= BASE_CONVERSION_LEAF_DIGITS:
+        return _read_leaf_digits(digits, 0, base, width, values)
+
+    backend: BigIntBackend = get_big_int_backend()
+    base_powers: list[BigNumber] = get_base_powers(backend, base, width)
+    big_number: BigNumber = _read_digits(backend, digits, 0, base, base_powers, width, values)
+    number: int = backend.to_int(big_number)
+    return number
+
+
+def _read_digits(
+    backend: BigIntBackend,
+    digits: Sequence[int],
+    start: int,
+    base: int,
+    base_powers: list[BigNumber],
+    width: int,
+    values: Sequence[int],
+) -> BigNumber:
+    # Careful! This function is recursive
+    # Mirror of _write_digits - both halves are read separately and joined with one big multiplication
+    if width <= BASE_CONVERSION_LEAF_DIGITS:
+        return backend.from_small_int(_read_leaf_digits(digits, start, base, width, values))
+
+    power_index: int = (width - 1).bit_length() - 1
+    low_width: int = 2**power_index
+    high_width: int = width - low_width
+    high: BigNumber = _read_digits(backend, digits, start, base, base_powers, high_width, values)
+    low: BigNumber = _read_digits(
+        backend, digits, start + high_width, base, base_powers, low_width, values
+    )
+    return backend.add(backend.multiply(high, base_powers[power_index]), low)
+
+
+def _read_leaf_digits(
+    digits: Sequence[int],
+    start: int,
+    base: int,
+    width: int,
+    values: Sequence[int],
+) -> int:
+    number: int = 0
+    for position in range(start, start + width):
+        digit: int = values[digits[position]]
+        if digit < 0 or digit >= base:
+            raise RuntimeError(
+                f"{LOGS_ERROR_GENERIC_PREFIX}{s}{_read_leaf_digits.__name__}{s}Position: {position}"
+                f"{s}Element: {digits[position]}{s}Not a valid digit!"
+            )
+        number = number * base + digit
+    return number
+
+
+def as_high_base(number: int, profile: str = UNICODE_ALPHABET_PROFILE) -> str:
+    # Digits are written straight into a buffer of code points, which is decoded into a string once
+    signs_table: Sequence[int] = get_signs_table(profile)
+
+    base: int = len(signs_table)
+    digits_count: int = 1 if number == 0 else get_digits_count_upper_bound(number, base)
+    digits: array[int] = array(CODE_POINTS_TYPECODE, bytes(digits_count * 4))
+    write_digits(digits, number, base, signs_table)
+
+    zero_sign: int = signs_table[0]
+    leading_zeros: int = 0
+    while leading_zeros < digits_count - 1 and digits[leading_zeros] == zero_sign:
+        leading_zeros += 1
+
+    number_as_base: str = signs_to_text(memoryview(digits)[leading_zeros:])
     return number_as_base
 
 
-# def from_high_base(number: str) -> int:
-#     valid_unicode_signs: tuple[str, ...] = VALID_unicode_signs
-#     lookup
+def get_signs_table(profile: str = UNICODE_ALPHABET_PROFILE) -> Sequence[int]:
+    # What the conversion engine writes for every digit - the final code points, so signs_to_text only decodes them
+    base: int = get_profile_alphabet_size(profile)
+    return memoryview(get_allowed_unicode_code_points())[:base]
+
+
+def signs_to_text(signs: memoryview) -> str:
+    return str(signs, CODE_POINTS_ENCODING)
+
+
+@functools.lru_cache(maxsize=1)
+def _get_numpy_code_points() -> Any:
+    numpy: ModuleType | None = get_numpy()
+    assert numpy is not None
+    return numpy.array(get_allowed_unicode_code_points(), dtype="<u4")
+
+
+def from_high_base(number: str, profile: str = UNICODE_ALPHABET_PROFILE) -> int:
+    # Code points are viewed in place (no per-character objects) and looked up in a dense index
+    digits_index: array[int] = get_allowed_unicode_digits_index()
+    base: int = get_profile_alphabet_size(profile)
+
+    number_bytes: bytes = number.encode(CODE_POINTS_ENCODING)
+    code_points: memoryview = memoryview(number_bytes).cast(CODE_POINTS_TYPECODE)
+    result: int = read_digits(code_points, base, digits_index)
+    return result
+
+
+def as_high_base_blocks(data: bytes, profile: str = UNICODE_ALPHABET_PROFILE) -> str:
+    parts: Iterator[str] = iter_as_high_base_blocks(BytesIO(data), profile=profile)
+    return "".join(parts)
+
+
+def from_high_base_blocks(text: str, profile: str = UNICODE_ALPHABET_PROFILE) -> bytes:
+    parts: Iterator[bytes] = iter_from_high_base_blocks(StringIO(text), profile=profile)
+    return b"".join(parts)
+
+
+def iter_as_high_base_blocks(
+    source: BinaryIO | Buffer,
+    block_size: int = HIGH_BASE_BLOCK_SIZE_BYTES,
+    profile: str = UNICODE_ALPHABET_PROFILE,
+) -> Iterator[str]:
+    # Layout: ( GROUP ) ... ( PARTIAL GROUP ) [ TRAILER ]
+    # Every full block of `block_size` bytes becomes a GROUP of exactly get_block_signs_count(block_size) signs
+    # The last (shorter, possibly empty) block becomes a PARTIAL GROUP sized by its own length
+    # TRAILER holds that length, so the decoder knows where the PARTIAL GROUP starts
+    # It's a single sign, unless the alphabet is smaller than the block size (see get_blocks_trailer_signs_count)
+    logs_infix: str = f"{iter_as_high_base_blocks.__name__}{s}Block Size: {block_size}{s}"
+    base: int = get_profile_alphabet_size(profile)
+    _ensure_valid_block_size(block_size)
+
+    group_size: int = get_block_signs_count(block_size, base)
+    density_loss: float = get_block_density_loss(block_size, base)
+    l.debug(f"{logs_infix}Group Size: {group_size}{s}Density loss: {density_loss:.4%}")
+
+    chunk_size: int = block_size * HIGH_BASE_BLOCKS_PER_CHUNK
+    for chunk in iter_chunks(source, chunk_size):
+        yield as_high_base_blocks_chunk(chunk, chunk_size, block_size, profile)
+
+
+def as_high_base_blocks_chunk(
+    chunk: Buffer,
+    chunk_size: int,
+    block_size: int = HIGH_BASE_BLOCK_SIZE_BYTES,
+    profile: str = UNICODE_ALPHABET_PROFILE,
+) -> str:
+    # One chunk of iter_as_high_base_blocks. Only the last chunk is shorter than chunk_size, and it ends with the tail
+    chunk_view: memoryview = memoryview(chunk)
+    if len(chunk_view) == chunk_size:
+        return as_high_base_full_blocks(chunk_view, block_size, profile)
+
+    tail_start: int = len(chunk_view) - len(chunk_view) % block_size
+    return as_high_base_full_blocks(chunk_view[:tail_start], block_size, profile) + as_high_base_tail(
+        chunk_view[tail_start:], block_size, profile
+    )
+
+
+def iter_from_high_base_blocks(
+    source: TextIO,
+    block_size: int = HIGH_BASE_BLOCK_SIZE_BYTES,
+    profile: str = UNICODE_ALPHABET_PROFILE,
+) -> Iterator[bytes]:
+    base: int = get_profile_alphabet_size(profile)
+    _ensure_valid_block_size(block_size)
+
+    group_size: int = get_block_signs_count(block_size, base)
+    trailer_signs_count: int = get_blocks_trailer_signs_count(block_size, base)
+    chunk_size: int = group_size * HIGH_BASE_BLOCKS_PER_CHUNK
+    buffer: str = ""
+    while True:
+        text: str = source.read(chunk_size)
+        buffer += text
+        if not text:
+            break
+
+        # PARTIAL GROUP + TRAILER is at most group_size + trailer_signs_count signs long, so anything
+        # in front of that many last signs must be made of full groups
+        full_groups_count: int = max(0, len(buffer) - group_size - trailer_signs_count) // group_size
+        full_groups_end: int = full_groups_count * group_size
+        yield from_high_base_full_groups(buffer[:full_groups_end], block_size, profile)
+        buffer = buffer[full_groups_end:]
+
+    tail_start: int = get_high_base_tail_start(buffer, block_size, profile)
+    yield from_high_base_full_groups(buffer[:tail_start], block_size, profile)
+    yield from_high_base_tail(buffer[tail_start:], block_size, profile)
+
+
+def as_high_base_full_blocks(
+    data: Buffer,
+    block_size: int = HIGH_BASE_BLOCK_SIZE_BYTES,
+    profile: str = UNICODE_ALPHABET_PROFILE,
+) -> str:
+    # The data must be made of whole blocks. Encodes them into GROUPs (no trailer)
+    signs_table: Sequence[int] = get_signs_table(profile)
+    base: int = len(signs_table)
+    data_view: memoryview = memoryview(data)
+    blocks_count, misaligned_count = divmod(len(data_view), block_size)
+    if misaligned_count:
+        raise RuntimeError(
+            f"{LOGS_ERROR_GENERIC_PREFIX}{s}{as_high_base_full_blocks.__name__}{s}Data Length: {len(data_view)}"
+            f"{s}Block Size: {block_size}{s}Data isn't made of whole blocks!"
+        )
+
+    group_size: int = get_block_signs_count(block_size, base)
+    signs: array[int] = array(CODE_POINTS_TYPECODE, bytes(blocks_count * group_size * 4))
+    signs_view: memoryview = memoryview(signs)
+    for i in range(blocks_count):
+        block: memoryview = data_view[i * block_size : (i + 1) * block_size]
+        group: memoryview = signs_view[i * group_size : (i + 1) * group_size]
+        write_digits(group, int.from_bytes(block, "big"), base, signs_table)
+    return signs_to_text(signs_view)
+
+
+def as_high_base_tail(
+    data: Buffer,
+    block_size: int = HIGH_BASE_BLOCK_SIZE_BYTES,
+    profile: str = UNICODE_ALPHABET_PROFILE,
+) -> str:
+    # Encodes the last block (shorter than block_size, possibly empty) into PARTIAL GROUP + TRAILER
+    signs_table: Sequence[int] = get_signs_table(profile)
+    base: int = len(signs_table)
+    data_view: memoryview = memoryview(data)
+    tail_size: int = len(data_view)
+    if tail_size >= block_size:
+        raise RuntimeError(
+            f"{LOGS_ERROR_GENERIC_PREFIX}{s}{as_high_base_tail.__name__}{s}Tail Size: {tail_size}"
+            f"{s}Block Size: {block_size}{s}Tail must be shorter than a block!"
+        )
+
+    tail_group_size: int = get_block_signs_count(tail_size, base)
+    trailer_signs_count: int = get_blocks_trailer_signs_count(block_size, base)
+    signs: array[int] = array(
+        CODE_POINTS_TYPECODE, bytes((tail_group_size + trailer_signs_count) * 4)
+    )
+    signs_view: memoryview = memoryview(signs)
+    write_digits(signs_view[:tail_group_size], int.from_bytes(data_view, "big"), base, signs_table)
+    write_digits(signs_view[tail_group_size:], tail_size, base, signs_table)
+    return signs_to_text(signs_view)
+
+
+def from_high_base_full_groups(
+    text: str,
+    block_size: int = HIGH_BASE_BLOCK_SIZE_BYTES,
+    profile: str = UNICODE_ALPHABET_PROFILE,
+) -> bytes:
+    # The text must be made of whole GROUPs (no trailer)
+    logs_infix: str = f"{from_high_base_full_groups.__name__}{s}Block Size: {block_size}{s}"
+    digits_index: array[int] = get_allowed_unicode_digits_index()
+    base: int = get_profile_alphabet_size(profile)
+
+    group_size: int = get_block_signs_count(block_size, base)
+    groups_count, misaligned_count = divmod(len(text), group_size)
+    if misaligned_count:
+        raise RuntimeError(
+            f"{LOGS_ERROR_GENERIC_PREFIX}{s}{logs_infix}Signs Count: {len(text)}"
+            f"{s}Signs don't line up into groups!{_BLOCKS_TIP_POSTFIX}"
+        )
+
+    text_bytes: bytes = text.encode(CODE_POINTS_ENCODING)
+    groups: memoryview = memoryview(text_bytes).cast(CODE_POINTS_TYPECODE)
+    decoded: bytearray = bytearray()
+    for i in range(groups_count):
+        group: memoryview = groups[i * group_size : (i + 1) * group_size]
+        number: int = read_digits(group, base, digits_index)
+        decoded += _block_to_bytes(number, block_size, logs_infix)
+    return bytes(decoded)
+
+
+def from_high_base_tail(
+    text: str,
+    block_size: int = HIGH_BASE_BLOCK_SIZE_BYTES,
+    profile: str = UNICODE_ALPHABET_PROFILE,
+) -> bytes:
+    # The text must be exactly PARTIAL GROUP + TRAILER
+    logs_infix: str = f"{from_high_base_tail.__name__}{s}Block Size: {block_size}{s}"
+    digits_index: array[int] = get_allowed_unicode_digits_index()
+    base: int = get_profile_alphabet_size(profile)
+
+    tail_size: int = _read_blocks_trailer(text, block_size, base)
+    tail_group_size: int = get_block_signs_count(tail_size, base)
+    trailer_signs_count: int = get_blocks_trailer_signs_count(block_size, base)
+    if len(text) != tail_group_size + trailer_signs_count:
+        raise RuntimeError(
+            f"{LOGS_ERROR_GENERIC_PREFIX}{s}{logs_infix}Got {len(text) - trailer_signs_count} signs in the partial group"
+            f" instead of {tail_group_size}!{_BLOCKS_TIP_POSTFIX}"
+        )
+    if tail_size == 0:
+        return b""
+
+    tail_group_bytes: bytes = text[:tail_group_size].encode(CODE_POINTS_ENCODING)
+    tail_group: memoryview = memoryview(tail_group_bytes).cast(CODE_POINTS_TYPECODE)
+    number: int = read_digits(tail_group, base, digits_index)
+    return _block_to_bytes(number, tail_size, logs_infix)
+
+
+def get_high_base_tail_start(
+    text: str,
+    block_size: int = HIGH_BASE_BLOCK_SIZE_BYTES,
+    profile: str = UNICODE_ALPHABET_PROFILE,
+) -> int:
+    # Where PARTIAL GROUP + TRAILER starts in a complete blocks mode text. Everything before are full groups
+    logs_infix: str = f"{get_high_base_tail_start.__name__}{s}Block Size: {block_size}{s}"
+    base: int = get_profile_alphabet_size(profile)
+
+    tail_size: int = _read_blocks_trailer(text, block_size, base)
+    trailer_signs_count: int = get_blocks_trailer_signs_count(block_size, base)
+    tail_start: int = len(text) - trailer_signs_count - get_block_signs_count(tail_size, base)
+    group_size: int = get_block_signs_count(block_size, base)
+    if tail_start < 0 or tail_start % group_size:
+        raise RuntimeError(
+            f"{LOGS_ERROR_GENERIC_PREFIX}{s}{logs_infix}Signs Count: {len(text)}{s}Trailer: {tail_size}"
+            f"{s}Signs don't line up into groups!{_BLOCKS_TIP_POSTFIX}"
+        )
+    return tail_start
+
+
+@functools.lru_cache(maxsize=None)
+def get_block_signs_count(block_size: int, base: int) -> int:
+    # The smallest count of signs that can hold every possible block of this size
+    if block_size == 0:
+        return 0
+    block_values_count: int = 256**block_size
+    signs_count: int = math.ceil(block_size * 8 / math.log2(base))
+    while base**signs_count < block_values_count:
+        signs_count += 1
+    while base ** (signs_count - 1) >= block_values_count:
+        signs_count -= 1
+    return signs_count
+
+
+def get_blocks_trailer_signs_count(block_size: int, base: int) -> int:
+    # The TRAILER holds a length below block_size. That's a single sign, unless the alphabet is smaller than that
+    trailer_signs_count: int = get_digits_count(block_size - 1, base)
+    return trailer_signs_count
+
+
+def get_block_density_loss(block_size: int, base: int) -> float:
+    # How many more signs the blocks mode needs than the integer mode (0.01 == 1% more), ignoring the trailer
+    integer_signs_per_block: float = block_size * 8 / math.log2(base)
+    block_signs: int = get_block_signs_count(block_size, base)
+    density_loss: float = block_signs / integer_signs_per_block - 1
+    return density_loss
+
+
+def as_high_base_power_of_two(data: bytes, profile: str = UNICODE_ALPHABET_PROFILE) -> str:
+    parts: Iterator[str] = iter_as_high_base_power_of_two(BytesIO(data), profile)
+    return "".join(parts)
+
+
+def from_high_base_power_of_two(text: str, profile: str = UNICODE_ALPHABET_PROFILE) -> bytes:
+    parts: Iterator[bytes] = iter_from_high_base_power_of_two(StringIO(text), profile)
+    return b"".join(parts)
+
+
+def get_power_of_two_bits(profile: str = UNICODE_ALPHABET_PROFILE) -> int:
+    # The power of two mode uses only the first 2 ** bits signs of the profile
+    bits: int = get_profile_alphabet_size(profile).bit_length() - 1
+    return bits
+
+
+def iter_as_high_base_power_of_two(
+    source: BinaryIO | Buffer, profile: str = UNICODE_ALPHABET_PROFILE
+) -> Iterator[str]:
+    # Layout: ( SIGN ) ... [ TRAILER ]
+    # The bytes are sliced into `bits`-bit digits, most significant first. The last digit is padded with zero bits
+    # TRAILER is a single sign holding the count of those padding bits
+    bits: int = get_power_of_two_bits(profile)
+    chunk_size: int = get_power_of_two_chunk_size(profile)
+    l.debug(f"{iter_as_high_base_power_of_two.__name__}{s}Bits: {bits}{s}Alphabet size: {2**bits}")
+
+    for chunk in iter_chunks(source, chunk_size):
+        yield as_high_base_power_of_two_chunk(chunk, chunk_size, profile)
+
+
+def get_power_of_two_chunk_size(profile: str = UNICODE_ALPHABET_PROFILE) -> int:
+    bits: int = get_power_of_two_bits(profile)
+    group_bytes: int = math.lcm(8, bits) // 8
+    return group_bytes * HIGH_BASE_POWER_OF_TWO_GROUPS_PER_CHUNK
+
+
+def as_high_base_power_of_two_chunk(
+    chunk: Buffer, chunk_size: int, profile: str = UNICODE_ALPHABET_PROFILE
+) -> str:
+    # One chunk of iter_as_high_base_power_of_two. Only the last chunk is shorter than chunk_size, and it ends with the trailer
+    bits: int = get_power_of_two_bits(profile)
+    chunk_view: memoryview = memoryview(chunk)
+    if len(chunk_view) == chunk_size:
+        return _bytes_to_power_of_two_signs(chunk_view, bits, 0, profile)
+
+    padding: int = -len(chunk_view) * 8 % bits
+    return _bytes_to_power_of_two_signs(chunk_view, bits, padding, profile, is_trailed=True)
+
+
+def iter_from_high_base_power_of_two(
+    source: TextIO, profile: str = UNICODE_ALPHABET_PROFILE
+) -> Iterator[bytes]:
+    logs_infix: str = f"{iter_from_high_base_power_of_two.__name__}{s}"
+    bits: int = get_power_of_two_bits(profile)
+    group_signs: int = math.lcm(8, bits) // bits
+    chunk_size: int = group_signs * HIGH_BASE_POWER_OF_TWO_GROUPS_PER_CHUNK
+
+    buffer: str = ""
+    while True:
+        text: str = source.read(chunk_size)
+        buffer += text
+        if not text:
+            break
+
+        # The last group may be padded and the last sign may be the TRAILER, so both are always kept back
+        full_groups_end: int = max(0, len(buffer) - group_signs - 1) // group_signs * group_signs
+        yield _power_of_two_signs_to_bytes(buffer[:full_groups_end], bits, 0)
+        buffer = buffer[full_groups_end:]
+
+    if not buffer:
+        raise RuntimeError(
+            f"{LOGS_ERROR_GENERIC_PREFIX}{s}{logs_infix}Missing trailer!"
+        )
+    padding: int = get_code_point_digit(ord(buffer[-1]))
+    if padding < 0 or padding >= bits or ((len(buffer) - 1) * bits - padding) % 8:
+        raise RuntimeError(
+            f"{LOGS_ERROR_GENERIC_PREFIX}{s}{logs_infix}Trailer: {padding}{s}Signs Count: {len(buffer) - 1}"
+            f"{s}Invalid trailer!{s}Tip: Your text may be invalid"
+        )
+    yield _power_of_two_signs_to_bytes(buffer[:-1], bits, padding)
+
+
+def _bytes_to_power_of_two_signs(
+    data: Buffer, bits: int, padding: int, profile: str, is_trailed: bool = False
+) -> str:
+    if get_numpy() is not None:
+        return _bytes_to_power_of_two_signs_numpy(data, bits, padding, profile, is_trailed)
+
+    # Small slices of the data are turned into ints and cut into digits with shifts, so no big number is ever made
+    signs_table: Sequence[int] = get_signs_table(profile)
+    mask: int = (1 << bits) - 1
+    group_bytes: int = math.lcm(8, bits) // 8
+    group_signs: int = math.lcm(8, bits) // bits
+    # Slices of about BASE_CONVERSION_LEAF_DIGITS signs
+    slice_groups: int = max(1, BASE_CONVERSION_LEAF_DIGITS // group_signs)
+    slice_bytes: int = group_bytes * slice_groups
+
+    data_view: memoryview = memoryview(data)
+    signs_count: int = (len(data_view) * 8 + padding) // bits
+    signs: array[int] = array(CODE_POINTS_TYPECODE, bytes((signs_count + is_trailed) * 4))
+    position: int = 0
+    for start in range(0, len(data_view), slice_bytes):
+        data_slice: memoryview = data_view[start : start + slice_bytes]
+        slice_padding: int = padding if start + slice_bytes >= len(data_view) else 0
+        number: int = int.from_bytes(data_slice, "big") << slice_padding
+        slice_signs_count: int = (len(data_slice) * 8 + slice_padding) // bits
+        for i in range(position + slice_signs_count - 1, position - 1, -1):
+            signs[i] = signs_table[number & mask]
+            number >>= bits
+        position += slice_signs_count
+
+    if is_trailed:
+        signs[-1] = signs_table[padding]
+    return signs_to_text(memoryview(signs))
+
+
+def _bytes_to_power_of_two_signs_numpy(
+    data: Buffer, bits: int, padding: int, profile: str, is_trailed: bool = False
+) -> str:
+    # Every digit's bits are laid out in a row, left-padded to 32 bits and packed back into a big-endian uint32
+    numpy: ModuleType | None = get_numpy()
+    assert numpy is not None
+    code_points: Any = _get_numpy_code_points()[: get_profile_alphabet_size(profile)]
+
+    data_bits: Any = numpy.unpackbits(numpy.frombuffer(data, dtype=numpy.uint8))
+    signs_count: int = (len(data_bits) + padding) // bits
+    digits_bits: Any = numpy.zeros((signs_count, 32), dtype=numpy.uint8)
+    digits_bits[:, 32 - bits :] = numpy.append(data_bits, numpy.zeros(padding, numpy.uint8)).reshape(signs_count, bits)
+    digits: Any = numpy.packbits(digits_bits, axis=1).view(">u4").ravel()
+
+    signs: Any = code_points[digits]
+    if is_trailed:
+        signs = numpy.append(signs, code_points[padding])
+    return signs.astype("<u4", copy=False).tobytes().decode("utf-32-le")
+
+
+def _power_of_two_signs_to_bytes(text: str, bits: int, padding: int) -> bytes:
+    logs_infix: str = f"{_power_of_two_signs_to_bytes.__name__}{s}"
+    digits_index: array[int] = get_allowed_unicode_digits_index()
+    alphabet_size: int = 1 << bits
+    group_signs: int = math.lcm(8, bits) // bits
+    slice_signs: int = group_signs * max(1, BASE_CONVERSION_LEAF_DIGITS // group_signs)
+
+    text_bytes: bytes = text.encode(CODE_POINTS_ENCODING)
+    code_points: memoryview = memoryview(text_bytes).cast(CODE_POINTS_TYPECODE)
+    decoded: bytearray = bytearray()
+    for start in range(0, len(code_points), slice_signs):
+        end: int = min(start + slice_signs, len(code_points))
+        number: int = 0
+        for position in range(start, end):
+            digit: int = digits_index[code_points[position]]
+            if digit < 0 or digit >= alphabet_size:
+                raise RuntimeError(
+                    f"{LOGS_ERROR_GENERIC_PREFIX}{s}{logs_infix}Position: {position}"
+                    f"{s}Element: {code_points[position]}{s}Not a valid digit!"
+                )
+            number = (number << bits) | digit
+
+        slice_padding: int = padding if end == len(code_points) else 0
+        slice_bytes_count: int = ((end - start) * bits - slice_padding) // 8
+        decoded += (number >> slice_padding).to_bytes(slice_bytes_count, "big")
+    return bytes(decoded)
+
+
+def encode_high_base(
+    data: bytes,
+    mode: HighBaseMode,
+    profile: str = UNICODE_ALPHABET_PROFILE,
+    codec: str = "none",
+    level: int | None = None,
+) -> str:
+    parts: Iterator[str] = iter_encode_high_base(BytesIO(data), mode, profile, codec, level)
+    return "".join(parts)
+
+
+def decode_high_base(text: str) -> bytes:
+    parts: Iterator[bytes] = iter_decode_high_base(StringIO(text))
+    return b"".join(parts)
+
+
+def iter_encode_high_base(
+    source: BinaryIO | Buffer,
+    mode: HighBaseMode,
+    profile: str = UNICODE_ALPHABET_PROFILE,
+    codec: str = "none",
+    level: int | None = None,
+) -> Iterator[str]:
+    # Layout: [ COMPRESSION HEADER ] [ PROFILE HEADER ] [ HEADER ] ( BODY )
+    # HEADER is a single sign telling which mode made the BODY, so decoding can pick the right path
+    # PROFILE HEADER is only there for profiles other than "full"
+    # COMPRESSION HEADER is only there when the data is compressed (with any codec but "none") before encoding
+    # The source is either a file or a buffer. Buffers (e.g. mmaps) are sliced in place and never copied whole
+    is_compressed: bool = codec != "none"
+    yield get_header(mode, profile, is_compressed)
+    if is_compressed:
+        source = open_parts_reader(compress_stream(iter_chunks(source, COPY_BLOCK_SIZE_BYTES), codec, level))
+    yield from _iter_encoded_body(source, mode, profile)
+
+
+def iter_encode_compressed_high_base(
+    source: BinaryIO | Buffer, mode: HighBaseMode, profile: str = UNICODE_ALPHABET_PROFILE
+) -> Iterator[str]:
+    # Like iter_encode_high_base, for a source that already is a payload with a CODEC HEADER
+    # (e.g. from make_tar_archive or open_compressing_writer), so it isn't compressed again
+    yield get_header(mode, profile, is_compressed=True)
+    yield from _iter_encoded_body(source, mode, profile)
+
+
+def _iter_encoded_body(source: BinaryIO | Buffer, mode: HighBaseMode, profile: str) -> Iterator[str]:
+    if mode == HighBaseMode.BLOCKS:
+        yield from iter_as_high_base_blocks(source, profile=profile)
+    elif mode == HighBaseMode.POWER_OF_TWO:
+        yield from iter_as_high_base_power_of_two(source, profile)
+    else:
+        data: Buffer = source if isinstance(source, Buffer) else source.read()
+        yield as_high_base(get_sentinel_int(data), profile)
+
+
+def iter_decode_high_base(source: TextIO, is_parallel: bool = False) -> Iterator[bytes]:
+    # is_parallel spreads the blocks mode across processes. The whole text is read first then, so it's for files
+    # and buffers - streamed text is better decoded as it comes
+    header: str = source.read(1)
+    is_compressed: bool = header == _COMPRESSION_HEADER
+    if is_compressed:
+        header = source.read(1)
+    profile: str = "full"
+    if header in _HEADER_PROFILES:
+        profile = _HEADER_PROFILES[header]
+        header = source.read(1)
+    mode: HighBaseMode = get_header_mode(header)
+    # Every chunk is checked against the alphabet as it's read, so a bad sign fails the decoding
+    # right where it is, before anything past it is converted
+    header_length: int = len(get_header(mode, profile, is_compressed))
+    source = cast(TextIO, SignsValidatingReader(source, get_profile_alphabet_size(profile), header_length))
+    if is_compressed:
+        yield from decompress_stream(_iter_decoded_body(source, mode, profile, is_parallel))
+    else:
+        yield from _iter_decoded_body(source, mode, profile, is_parallel)
+
+
+def _iter_decoded_body(source: TextIO, mode: HighBaseMode, profile: str, is_parallel: bool) -> Iterator[bytes]:
+    if mode == HighBaseMode.BLOCKS and is_parallel:
+        # parallel_helpers imports this module, so it's imported here
+        from parallel_helpers import parallel_from_high_base_blocks
+
+        yield parallel_from_high_base_blocks(source.read(), profile=profile)
+    elif mode == HighBaseMode.BLOCKS:
+        yield from iter_from_high_base_blocks(source, profile=profile)
+    elif mode == HighBaseMode.POWER_OF_TWO:
+        yield from iter_from_high_base_power_of_two(source, profile)
+    else:
+        number: int = from_high_base(source.read(), profile)
+        yield from_sentinel_int(number)
+
+
+class SignsValidatingReader(TextIOBase):
+    # A text source that raises on the first sign outside of the alphabet, with its position in the whole text
+    source: TextIO
+    invalid_signs_pattern: re.Pattern[str]
+    position: int
+
+    def __init__(self, source: TextIO, alphabet_size: int, position: int = 0) -> None:
+        self.source = source
+        self.invalid_signs_pattern = get_invalid_signs_pattern(alphabet_size)
+        self.position = position
+
+    def readable(self) -> bool:
+        return True
+
+    def read(self, size: int | None = -1) -> str:
+        # None means "read everything", like -1. Not every source takes None
+        text: str = self.source.read(-1 if size is None else size)
+        invalid_sign: re.Match[str] | None = self.invalid_signs_pattern.search(text)
+        if invalid_sign is not None:
+            raise RuntimeError(
+                f"{LOGS_ERROR_GENERIC_PREFIX}{s}{SignsValidatingReader.__name__}"
+                f"{s}Position: {self.position + invalid_sign.start()}"
+                f"{s}Element: {ord(invalid_sign.group())}{s}Not a valid sign!{s}Tip: Your text may be invalid"
+            )
+        self.position += len(text)
+        return text
+
+
+def get_header_mode(header: str) -> HighBaseMode:
+    if header not in _HEADER_MODES:
+        raise RuntimeError(
+            f"{LOGS_ERROR_GENERIC_PREFIX}{s}{get_header_mode.__name__}{s}Header: {header!r}"
+            f"{s}Unknown mode header!{s}Tip: Your text may be invalid or made by an older version"
+        )
+    return _HEADER_MODES[header]
+
+
+def get_mode_header(mode: HighBaseMode) -> str:
+    return _MODE_HEADERS[mode]
+
+
+def get_header(
+    mode: HighBaseMode, profile: str = UNICODE_ALPHABET_PROFILE, is_compressed: bool = False
+) -> str:
+    # Everything encode_high_base puts in front of the BODY
+    header: str = _MODE_HEADERS[mode]
+    if profile != "full":
+        if profile not in _PROFILE_HEADERS:
+            raise RuntimeError(
+                f"{LOGS_ERROR_GENERIC_PREFIX}{s}{get_header.__name__}{s}Profile: {profile}"
+                f"{s}Alphabet profile has no header, so texts made with it couldn't be decoded!"
+            )
+        header = _PROFILE_HEADERS[profile] + header
+    if is_compressed:
+        header = _COMPRESSION_HEADER + header
+    return header
+
+
+def get_sentinel_int(data: Buffer) -> int:
+    # int.from_bytes forgets leading zero bytes. A 1 bit in front of the data keeps them
+    data_view: memoryview = memoryview(data).cast("B")
+    number: int = (1 << (len(data_view) * 8)) | int.from_bytes(data_view, "big")
+    return number
+
+
+def from_sentinel_int(number: int) -> bytes:
+    logs_infix: str = f"{from_sentinel_int.__name__}{s}"
+    data_length: int = (number.bit_length() - 1) // 8
+    if number < 1 or number >> (data_length * 8) != 1:
+        raise RuntimeError(
+            f"{LOGS_ERROR_GENERIC_PREFIX}{s}{logs_infix}Number doesn't start with a sentinel bit!"
+            f"{s}Tip: Your text may be invalid"
+        )
+    sentinel: int = 1 << (data_length * 8)
+    data: bytes = (number ^ sentinel).to_bytes(data_length, "big")
+    return data
+
+
+class HighBaseEstimate(NamedTuple):
+    # Signs are exact. Bytes are expected values (digits are assumed to be spread evenly over the alphabet)
+    # with the bounds for all signs being the cheapest / the most expensive
+    mode: HighBaseMode
+    profile: str
+    codec: str
+    payload_bytes: int  # After compressing
+    signs_count: int
+    utf8_bytes_min: int
+    utf8_bytes_expected: int
+    utf8_bytes_max: int
+    utf16_bytes_min: int
+    utf16_bytes_expected: int
+    utf16_bytes_max: int
+
+
+def estimate_high_base(
+    data: Buffer,
+    mode: HighBaseMode,
+    profile: str = UNICODE_ALPHABET_PROFILE,
+    codec: str = "none",
+    level: int | None = None,
+) -> HighBaseEstimate:
+    # Sizes what encode_high_base(data, mode, profile, codec, level) would return, without doing the conversion
+    # Compressed sizes can't be predicted, so the data is compressed for real
+    is_compressed: bool = codec != "none"
+    if is_compressed:
+        data = compress(data, codec, level)
+    base: int = get_profile_alphabet_size(profile)
+    alphabet_size: int = base
+    data_length: int = memoryview(data).nbytes
+    # Signs known up front - the headers and the TRAILER in the modes that have one. Those are sized exactly
+    fixed_text: str = get_header(mode, profile, is_compressed)
+
+    body_signs_count: int
+    if mode == HighBaseMode.BLOCKS:
+        block_size: int = HIGH_BASE_BLOCK_SIZE_BYTES
+        full_blocks_count, tail_size = divmod(data_length, block_size)
+        body_signs_count = full_blocks_count * get_block_signs_count(block_size, base)
+        body_signs_count += get_block_signs_count(tail_size, base)
+        fixed_text += _digits_to_text(tail_size, base, get_blocks_trailer_signs_count(block_size, base))
+    elif mode == HighBaseMode.POWER_OF_TWO:
+        bits: int = get_power_of_two_bits(profile)
+        alphabet_size = 2**bits
+        body_signs_count = math.ceil(data_length * 8 / bits)
+        fixed_text += _digits_to_text(-data_length * 8 % bits, base, 1)
+    else:
+        body_signs_count = get_digits_count(get_sentinel_int(data), base)
+
+    utf8_counts: dict[int, int] = get_encoded_lengths_counts(alphabet_size, "utf-8")
+    utf16_counts: dict[int, int] = get_encoded_lengths_counts(alphabet_size, "utf-16-le")
+
+    def get_bytes_bounds(counts: dict[int, int], fixed_bytes: int) -> tuple[int, int, int]:
+        lengths: list[int] = [length for length, count in counts.items() if count]
+        expected_length: float = sum(length * count for length, count in counts.items()) / alphabet_size
+        return (
+            fixed_bytes + body_signs_count * min(lengths),
+            fixed_bytes + round(body_signs_count * expected_length),
+            fixed_bytes + body_signs_count * max(lengths),
+        )
+
+    utf8_min, utf8_expected, utf8_max = get_bytes_bounds(utf8_counts, len(fixed_text.encode("utf-8")))
+    utf16_min, utf16_expected, utf16_max = get_bytes_bounds(
+        utf16_counts, len(fixed_text.encode("utf-16-le"))
+    )
+    estimate: HighBaseEstimate = HighBaseEstimate(
+        mode=mode,
+        profile=profile,
+        codec=codec,
+        payload_bytes=data_length,
+        signs_count=len(fixed_text) + body_signs_count,
+        utf8_bytes_min=utf8_min,
+        utf8_bytes_expected=utf8_expected,
+        utf8_bytes_max=utf8_max,
+        utf16_bytes_min=utf16_min,
+        utf16_bytes_expected=utf16_expected,
+        utf16_bytes_max=utf16_max,
+    )
+    return estimate
+
+
+def get_transport_cost(
+    sink: TransportSink, mode: HighBaseMode, profile: str = UNICODE_ALPHABET_PROFILE
+) -> float:
+    # Units the sink counts (bytes, or code points) per input byte, for long inputs - headers and trailers are left out
+    base: int = get_profile_alphabet_size(profile)
+    alphabet_size: int = base
+
+    bits_per_sign: float
+    if mode == HighBaseMode.BLOCKS:
+        block_size: int = HIGH_BASE_BLOCK_SIZE_BYTES
+        bits_per_sign = block_size * 8 / get_block_signs_count(block_size, base)
+    elif mode == HighBaseMode.POWER_OF_TWO:
+        bits_per_sign = get_power_of_two_bits(profile)
+        alphabet_size = 2 ** int(bits_per_sign)
+    else:
+        bits_per_sign = math.log2(base)
+
+    sign_cost: float = 1.0
+    if sink != TransportSink.CODE_POINTS:
+        encoding: str = "utf-8" if sink == TransportSink.UTF8 else "utf-16-le"
+        counts: dict[int, int] = get_encoded_lengths_counts(alphabet_size, encoding)
+        sign_cost = sum(length * count for length, count in counts.items()) / alphabet_size
+    transport_cost: float = sign_cost * 8 / bits_per_sign
+    return transport_cost
+
+
+def pick_alphabet_profile(sink: TransportSink, mode: HighBaseMode) -> tuple[str, float]:
+    # The profile that transmits the fewest units per input byte to this sink, and that figure
+    # A supplementary plane sign is 2 UTF-16 code units and 4 UTF-8 bytes, so a smaller alphabet often wins
+    # Only profiles with a header are candidates, since texts made with the others couldn't be decoded
+    profiles: list[str] = [
+        profile for profile in ("full", *_PROFILE_HEADERS) if profile in UNICODE_ALPHABET_PROFILES
+    ]
+    costs: dict[str, float] = {profile: get_transport_cost(sink, mode, profile) for profile in profiles}
+    best_profile: str = min(costs, key=costs.__getitem__)
+    l.debug(
+        f"{pick_alphabet_profile.__name__}{s}Sink: {sink.value}{s}Mode: {mode.value}{s}"
+        + ", ".join(f"{profile}: {cost:.4f}" for profile, cost in costs.items())
+    )
+    return best_profile, costs[best_profile]
+
+
+def get_digits_count(number: int, base: int) -> int:
+    # Exact count of digits, from the logarithm. Only when the number is extremely close to a power of the base
+    # the float can't be trusted and the power is actually calculated
+    if number == 0:
+        return 1
+
+    digits_log: float = math.log2(number) / math.log2(base)
+    nearest_power: int = round(digits_log)
+    if abs(digits_log - nearest_power) > 1e-9 * max(1.0, digits_log):
+        return math.floor(digits_log) + 1
+    if number >= base**nearest_power:
+        return nearest_power + 1
+    return nearest_power
+
+
+def _ensure_valid_block_size(block_size: int) -> None:
+    if block_size < 1:
+        raise RuntimeError(
+            f"{LOGS_ERROR_GENERIC_PREFIX}{s}{_ensure_valid_block_size.__name__}{s}Block Size: {block_size}"
+            f"{s}Block size must be at least 1!"
+        )
+
+
+def _read_blocks_trailer(text: str, block_size: int, base: int) -> int:
+    logs_infix: str = f"{_read_blocks_trailer.__name__}{s}Block Size: {block_size}{s}"
+    trailer_signs_count: int = get_blocks_trailer_signs_count(block_size, base)
+    if len(text) < trailer_signs_count:
+        raise RuntimeError(
+            f"{LOGS_ERROR_GENERIC_PREFIX}{s}{logs_infix}Missing trailer!{_BLOCKS_TIP_POSTFIX}"
+        )
+    tail_size: int = 0
+    for sign in text[-trailer_signs_count:]:
+        digit: int = get_code_point_digit(ord(sign))
+        if digit < 0 or digit >= base:
+            tail_size = -1
+            break
+        tail_size = tail_size * base + digit
+    if tail_size < 0 or tail_size >= block_size:
+        raise RuntimeError(
+            f"{LOGS_ERROR_GENERIC_PREFIX}{s}{logs_infix}Trailer: {tail_size}{s}Invalid trailer!{_BLOCKS_TIP_POSTFIX}"
+        )
+    return tail_size
+
+
+def _digits_to_text(number: int, base: int, width: int) -> str:
+    # For the few signs around the BODY, e.g. the TRAILER
+    digits: list[int] = [0] * width
+    write_digits(digits, number, base, get_allowed_unicode_code_points())
+    return "".join(map(chr, digits))
+
+
+def _block_to_bytes(number: int, block_size: int, logs_infix: str) -> bytes:
+    try:
+        return number.to_bytes(block_size, "big")
+    except OverflowError:
+        raise RuntimeError(
+            f"{LOGS_ERROR_GENERIC_PREFIX}{s}{logs_infix}Group holds a number too big for its block!{_BLOCKS_TIP_POSTFIX}"
+        )
+
+
+def iter_chunks(source: BinaryIO | Buffer, chunk_size: int) -> Iterator[memoryview]:
+    # Full chunks, then a last shorter (possibly empty) one. Buffers are sliced in place, files are read
+    if isinstance(source, Buffer):
+        source_view: memoryview = memoryview(source).cast("B")
+        for start in range(0, len(source_view) + 1, chunk_size):
+            yield source_view[start : start + chunk_size]
+        return
+
+    while True:
+        chunk: bytes = _read_full(source, chunk_size)
+        yield memoryview(chunk)
+        if len(chunk) < chunk_size:
+            return
+
 
-#     result: int = 0
-#     for digit in number:
+def _read_full(source: BinaryIO, size: int) -> bytes:
+    # A single read() may return less than asked for (e.g. from pipes) without being at EOF
+    data: bytearray = bytearray()
+    while len(data) < size:
+        part: bytes = source.read(size - len(data))
+        if not part:
+            break
+        data += part
+    return bytes(data)
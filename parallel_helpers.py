@@ -0,0 +1,99 @@
+"""This file contains functions for spreading work, like the high base blocks mode, across many processes"""
+
+from typing import TYPE_CHECKING, Any
+import math
+import os
+from number_base_helpers import (
+    from_high_base_full_groups,
+    from_high_base_tail,
+    get_block_signs_count,
+    get_high_base_tail_start,
+)
+from unicode_helpers import get_profile_alphabet_size
+from settings import (
+    HIGH_BASE_BLOCK_SIZE_BYTES,
+    UNICODE_ALPHABET_PROFILE,
+    PARALLEL_WORKERS_COUNT,
+    PARALLEL_MIN_INPUT_BYTES,
+    PARALLEL_TASKS_PER_WORKER,
+    LOGS_SEPARATOR as s,
+)
+from Logger import logger as l
+
+if TYPE_CHECKING:
+    from concurrent.futures import ProcessPoolExecutor
+    from multiprocessing.context import BaseContext
+
+
+def get_workers_count() -> int:
+    # 0 means "use every core"
+    workers_count: int = PARALLEL_WORKERS_COUNT
+    if workers_count <= 0:
+        workers_count = os.cpu_count() or 1
+    return workers_count
+
+
+def get_process_context() -> "BaseContext":
+    # Worker processes are started by a fork server (or spawned where there's none), never forked from this one
+    # The pools are started while other threads run (e.g. the stages of the encoding pipeline), and a forked child
+    # inherits the locks those threads hold at that moment, which can deadlock it
+    # Shared objects (multiprocessing.Value, ...) handed to the workers must come from this same context
+    import multiprocessing
+
+    method: str = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+    return multiprocessing.get_context(method)
+
+
+def get_process_pool_executor(workers_count: int, **kwargs: Any) -> "ProcessPoolExecutor":
+    # concurrent.futures and multiprocessing are slow to import, so they're imported here, only by runs that go parallel
+    # Whatever is sent to the workers is pickled. Memoryviews can't be, so buffers are sent as bytes
+    from concurrent.futures import ProcessPoolExecutor
+
+    return ProcessPoolExecutor(max_workers=workers_count, mp_context=get_process_context(), **kwargs)
+
+
+def parallel_from_high_base_blocks(
+    text: str,
+    block_size: int = HIGH_BASE_BLOCK_SIZE_BYTES,
+    profile: str = UNICODE_ALPHABET_PROFILE,
+) -> bytes:
+    # Same output as from_high_base_blocks. Full groups are shared out between processes in ranges
+    logs_infix: str = f"{parallel_from_high_base_blocks.__name__}{s}Length: {len(text)}{s}"
+    tail_start: int = get_high_base_tail_start(text, block_size, profile)
+    workers_count: int = get_workers_count()
+
+    group_size: int = get_block_signs_count(block_size, get_profile_alphabet_size(profile))
+    # Roughly the size of the decoded data, to compare against the same threshold as encoding
+    decoded_length: int = tail_start // group_size * block_size
+
+    parts: list[bytes]
+    if workers_count == 1 or decoded_length < PARALLEL_MIN_INPUT_BYTES:
+        l.debug(f"{logs_infix}Decoding in-process")
+        parts = [from_high_base_full_groups(text[:tail_start], block_size, profile)]
+    else:
+        ranges: list[tuple[int, int]] = _split_into_ranges(tail_start, group_size, workers_count)
+        l.debug(f"{logs_infix}Decoding {len(ranges)} ranges in {workers_count} processes")
+        with get_process_pool_executor(workers_count) as executor:
+            parts = list(
+                executor.map(
+                    from_high_base_full_groups,
+                    [text[start:end] for start, end in ranges],
+                    [block_size] * len(ranges),
+                    [profile] * len(ranges),
+                )
+            )
+
+    parts.append(from_high_base_tail(text[tail_start:], block_size, profile))
+    return b"".join(parts)
+
+
+def _split_into_ranges(length: int, unit: int, workers_count: int) -> list[tuple[int, int]]:
+    # Ranges are made of whole units. A few ranges per worker keep the workers busy when some finish early
+    units_count: int = length // unit
+    ranges_count: int = max(1, min(units_count, workers_count * PARALLEL_TASKS_PER_WORKER))
+    units_per_range: int = math.ceil(units_count / ranges_count)
+    range_length: int = max(unit, units_per_range * unit)
+    ranges: list[tuple[int, int]] = [
+        (start, min(start + range_length, length)) for start in range(0, length, range_length)
+    ]
+    return ranges
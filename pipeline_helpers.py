@@ -0,0 +1,246 @@
+"""This file contains a staged encoding pipeline, so reading, compressing, encoding and writing all happen at the same time"""
+
+from typing import TYPE_CHECKING, Any, BinaryIO, Callable, Iterable, Iterator, TextIO
+from collections import deque
+from collections.abc import Buffer
+from queue import Empty, Full, Queue
+import functools
+import threading
+from number_base_helpers import (
+    HighBaseMode,
+    as_high_base_blocks_chunk,
+    as_high_base_power_of_two_chunk,
+    get_header,
+    get_power_of_two_chunk_size,
+    iter_chunks,
+)
+from compression_helpers import compress_stream
+from parallel_helpers import get_process_pool_executor, get_workers_count
+from settings import (
+    HIGH_BASE_BLOCK_SIZE_BYTES,
+    HIGH_BASE_BLOCKS_PER_CHUNK,
+    PARALLEL_MIN_INPUT_BYTES,
+    PIPELINE_QUEUE_SIZE,
+    UNICODE_ALPHABET_PROFILE,
+    LOGS_ERROR_GENERIC_PREFIX,
+    LOGS_SEPARATOR as s,
+)
+from Logger import logger as l
+
+if TYPE_CHECKING:
+    from concurrent.futures import Future
+
+
+# Stages:  reader -> [ compressor ] -> encoder -> writer
+# Every stage is a thread, joined to the next one by a queue of at most PIPELINE_QUEUE_SIZE chunks
+# So while one chunk is being encoded, the next ones are already read and the previous ones are being written,
+# and no more than a few chunks per queue are ever held in memory
+# The encoder hands chunks to a process pool when there's more than one worker (encoding is CPU bound)
+type Compressor = Callable[[Iterable[Buffer]], Iterator[bytes]]
+type ChunkEncoder = Callable[[Buffer], str]
+
+
+_POLL_SECONDS: float = 0.1
+
+
+class _End:
+    # Put into a queue after the last item. Carries the error that stopped the stage, if any
+    error: BaseException | None
+
+    def __init__(self, error: BaseException | None = None) -> None:
+        self.error = error
+
+
+def get_is_pipeline_supported(mode: HighBaseMode) -> bool:
+    # The integer mode turns the whole input into a single number, so it has no chunks to overlap
+    return mode in (HighBaseMode.BLOCKS, HighBaseMode.POWER_OF_TWO)
+
+
+def get_chunk_encoder(
+    mode: HighBaseMode, profile: str = UNICODE_ALPHABET_PROFILE
+) -> tuple[int, ChunkEncoder]:
+    # (chunk size, encoder of one chunk). Partials of module-level functions, so they can be sent to other processes
+    if mode == HighBaseMode.BLOCKS:
+        chunk_size: int = HIGH_BASE_BLOCK_SIZE_BYTES * HIGH_BASE_BLOCKS_PER_CHUNK
+        return chunk_size, functools.partial(
+            as_high_base_blocks_chunk,
+            chunk_size=chunk_size,
+            block_size=HIGH_BASE_BLOCK_SIZE_BYTES,
+            profile=profile,
+        )
+    if mode == HighBaseMode.POWER_OF_TWO:
+        chunk_size = get_power_of_two_chunk_size(profile)
+        return chunk_size, functools.partial(
+            as_high_base_power_of_two_chunk, chunk_size=chunk_size, profile=profile
+        )
+    raise RuntimeError(
+        f"{LOGS_ERROR_GENERIC_PREFIX}{s}{get_chunk_encoder.__name__}{s}Mode: {mode.value}"
+        f"{s}This mode can't be encoded in chunks!"
+    )
+
+
+def write_high_base_pipelined(
+    source: BinaryIO | Buffer,
+    output: TextIO,
+    mode: HighBaseMode,
+    profile: str = UNICODE_ALPHABET_PROFILE,
+    codec: str = "none",
+    level: int | None = None,
+    queue_size: int = PIPELINE_QUEUE_SIZE,
+) -> None:
+    # Writes the same text as iter_encode_high_base
+    logs_infix: str = f"{write_high_base_pipelined.__name__}{s}Mode: {mode.value}{s}"
+    chunk_size, encode_chunk = get_chunk_encoder(mode, profile)
+    workers_count: int = get_workers_count()
+    l.debug(f"{logs_infix}Queue Size: {queue_size}{s}Workers: {workers_count}")
+
+    # Set once the writer stops, so the other stages stop instead of waiting on full queues
+    # Errors of the stages travel down the queues instead, so the writer raises the original error
+    stop: threading.Event = threading.Event()
+    read_chunks: Queue[Any] = Queue(queue_size)
+    encoded_parts: Queue[Any] = Queue(queue_size)
+
+    chunks: Iterator[Buffer] = iter_chunks(source, chunk_size)
+    threads: list[threading.Thread] = []
+    if codec == "none":
+        threads.append(_start_stage("reader", _pass_through, chunks, read_chunks, stop))
+    else:
+        compressed_chunks: Queue[Any] = Queue(queue_size)
+        threads.append(_start_stage("reader", _pass_through, chunks, compressed_chunks, stop))
+        compressor: Compressor = functools.partial(compress_stream, codec_name=codec, level=level)
+        compress: Callable[[Iterable[Any]], Iterator[Any]] = functools.partial(
+            _compress_into_chunks, compressor=compressor, chunk_size=chunk_size
+        )
+        threads.append(
+            _start_stage("compressor", compress, _iter_queue(compressed_chunks, stop), read_chunks, stop)
+        )
+    encode: Callable[[Iterable[Any]], Iterator[Any]] = functools.partial(
+        _encode_in_order, encode_chunk=encode_chunk, workers_count=workers_count, window=queue_size
+    )
+    threads.append(_start_stage("encoder", encode, _iter_queue(read_chunks, stop), encoded_parts, stop))
+
+    try:
+        output.write(get_header(mode, profile, is_compressed=codec != "none"))
+        for part in _iter_queue(encoded_parts, stop):
+            output.write(part)
+    finally:
+        stop.set()
+        for thread in threads:
+            thread.join()
+    l.debug(f"{logs_infix}Finished")
+
+
+def _start_stage(
+    name: str,
+    work: Callable[[Iterable[Any]], Iterator[Any]],
+    items: Iterable[Any],
+    output: Queue[Any],
+    stop: threading.Event,
+) -> threading.Thread:
+    def run() -> None:
+        error: BaseException | None = None
+        try:
+            for result in work(items):
+                if not _put(output, result, stop):
+                    return
+        except BaseException as stage_error:
+            error = stage_error
+        _put(output, _End(error), stop, force=error is not None)
+
+    thread: threading.Thread = threading.Thread(target=run, name=f"pipeline-{name}", daemon=True)
+    thread.start()
+    return thread
+
+
+def _put(queue: Queue[Any], item: Any, stop: threading.Event, force: bool = False) -> bool:
+    # Waits for room in the queue, but gives up once the pipeline is stopping
+    # An error is forced in (dropping what's queued), so the next stage always learns about it
+    while True:
+        try:
+            queue.put(item, timeout=_POLL_SECONDS)
+            return True
+        except Full:
+            if force:
+                _drain(queue)
+            elif stop.is_set():
+                return False
+
+
+def _drain(queue: Queue[Any]) -> None:
+    try:
+        while True:
+            queue.get_nowait()
+    except Empty:
+        pass
+
+
+def _iter_queue(queue: Queue[Any], stop: threading.Event) -> Iterator[Any]:
+    # Items up to the end marker. Re-raises the error of the previous stage
+    while True:
+        try:
+            item: Any = queue.get(timeout=_POLL_SECONDS)
+        except Empty:
+            if stop.is_set() and queue.empty():
+                # The previous stage may be gone without a marker (it stopped because the writer did)
+                _raise_stopped()
+            continue
+        if isinstance(item, _End):
+            if item.error is not None:
+                raise item.error
+            return
+        yield item
+
+
+def _raise_stopped() -> None:
+    raise RuntimeError(f"{LOGS_ERROR_GENERIC_PREFIX}{s}Pipeline{s}Stopped by another stage!")
+
+
+def _pass_through(items: Iterable[Any]) -> Iterator[Any]:
+    return iter(items)
+
+
+def _compress_into_chunks(chunks: Iterable[Buffer], compressor: Compressor, chunk_size: int) -> Iterator[bytes]:
+    # Compressed parts come in any sizes, so they're cut back into chunks
+    return _rechunk(compressor(chunks), chunk_size)
+
+
+def _rechunk(parts: Iterable[bytes], chunk_size: int) -> Iterator[bytes]:
+    # Full chunks, then a last shorter (possibly empty) one - the same shapes iter_chunks gives the encoders
+    buffer: bytearray = bytearray()
+    for part in parts:
+        buffer += part
+        full_end: int = len(buffer) - len(buffer) % chunk_size
+        for start in range(0, full_end, chunk_size):
+            yield bytes(buffer[start : start + chunk_size])
+        del buffer[:full_end]
+    yield bytes(buffer)
+
+
+def _encode_in_order(
+    chunks: Iterable[Buffer], encode_chunk: ChunkEncoder, workers_count: int, window: int
+) -> Iterator[str]:
+    # Input under PARALLEL_MIN_INPUT_BYTES isn't worth starting processes for, so it's encoded in-process
+    # The size of streamed input isn't known up front, so the pool starts only once that much was seen
+    chunks_iterator: Iterator[Buffer] = iter(chunks)
+    encoded_bytes: int = 0
+    for chunk in chunks_iterator:
+        yield encode_chunk(chunk)
+        encoded_bytes += memoryview(chunk).nbytes
+        if workers_count > 1 and encoded_bytes >= PARALLEL_MIN_INPUT_BYTES:
+            break
+    else:
+        return
+
+    # At most workers_count + window chunks are in flight. Results are taken in submission order
+    in_flight: deque["Future[str]"] = deque()
+    with get_process_pool_executor(workers_count) as executor:
+        try:
+            for chunk in chunks_iterator:
+                in_flight.append(executor.submit(encode_chunk, bytes(chunk)))
+                if len(in_flight) >= workers_count + window:
+                    yield in_flight.popleft().result()
+            while in_flight:
+                yield in_flight.popleft().result()
+        finally:
+            for future in in_flight:
+                future.cancel()
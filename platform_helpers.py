@@ -1,9 +1,8 @@
 from typing import Any, Callable
 import os
 import platform
-import subprocess
-import pyperclip # type: ignore # missing stubs
 import functools
+from types import ModuleType
 from data_helpers import dict_keys_contain_substring
 from settings import ANDROID_CLIPBOARD_TIMEOUT_SECONDS, LOGS_SEPARATOR as s
 from Logger import logger as l
@@ -18,44 +17,82 @@ def _get_os() -> str:
     os: str = platform.system()
     if os == "Linux" and get_is_android():
         os = "Android"
+    l.debug(f"{os}{s}Determined OS")
     return os
 get_os: Callable[[], str] = functools.lru_cache(maxsize=1, typed=True)(_get_os)
 
 
 def get_android_clipboard() -> str:
+    clipboard: str = get_raw_android_clipboard()
+    clipboard = clipboard.lower()
+    return clipboard
+
+
+def get_raw_android_clipboard() -> str:
     # THIS WILL SILENTLY FAIL IF TERMUX-API IS IMPROPERLY INSTALLED
     # I am not aware of any way to circumvent this
+    import subprocess
+
     timeout: int = ANDROID_CLIPBOARD_TIMEOUT_SECONDS
     result: subprocess.CompletedProcess[str] = subprocess.run(
         ["termux-clipboard-get"], capture_output=True, text=True, timeout=timeout
     )
     clipboard: str = result.stdout
-    clipboard = clipboard.lower()
     return clipboard
 
 
 def set_android_clipboard(text: str) -> None:
     # THIS WILL SILENTLY FAIL IF TERMUX-API IS IMPROPERLY INSTALLED
+    import subprocess
+
     subprocess.run([f"termux-clipboard-set"], input=text, text=True)
 
 
 def safely_set_android_clipboard(text: str) -> bool:
     "The return is if the set was a success"
     set_android_clipboard(text)
-    current_clipboard: str = get_android_clipboard()
+    current_clipboard: str = get_raw_android_clipboard()
     return current_clipboard == text
 
 
+@functools.lru_cache(maxsize=1)
+def get_pyperclip() -> ModuleType:
+    # Imported on first use, so runs that never touch the clipboard don't pay for it
+    import pyperclip # type: ignore # missing stubs
+    return pyperclip
+
+
 def get_clipboard() -> str:
-    clipboard: Any = pyperclip.paste()
+    clipboard: Any = get_pyperclip().paste()
     if type(clipboard) != str:
         raise RuntimeError("Failed to retrieve clipboard!")
     return clipboard
 
 
 def set_clipboard(text: str) -> None:
-    pyperclip.copy(text)  # type: ignore
+    get_pyperclip().copy(text)  # type: ignore
+
+
+def set_system_clipboard(text: str) -> bool:
+    "The return is if the set was a success"
+    if get_os() == "Android":
+        return safely_set_android_clipboard(text)
+    set_clipboard(text)
+    return True
+
+
+def get_system_clipboard() -> str:
+    # The clipboard of whatever this runs on, exactly as it is (encoded texts are case sensitive)
+    if get_os() == "Android":
+        return get_raw_android_clipboard()
+    return get_clipboard()
+
+
+# Determined on first access through __getattr__, so importing this module doesn't detect anything
+OS: str
 
 
-OS: str = get_os()
-l.debug(f"{OS}{s}Determined OS")
\ No newline at end of file
+def __getattr__(name: str) -> Any:
+    if name == "OS":
+        return get_os()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
\ No newline at end of file
@@ -3,8 +3,15 @@
 # WARNING: DO NOT CHANGE THE TYPE HINTS OF THE VARIABLES!!!
 IS_DEBUG: bool = True
 ANDROID_CLIPBOARD_TIMEOUT_SECONDS: int = 5
+# Longer texts are copied in several parts. Android drops clipboard transfers of about 1 MB and more (4 UTF-8 bytes per sign at most)
+CLIPBOARD_PART_MAX_SIGNS: int = 100_000
 BLACKLISTED_UNICODE_CATEGORIES: set[str] = {'Cs', 'Cc', 'Cf', 'Mn', 'Mc'}
 UNICODE_HIGHEST_CODE_PONT: int = 0x10FFFF
+UNICODE_ALPHABET_CACHE_DIR: str = "~/.cache/texter"
+# Alphabet profiles: the highest code point every profile may use, on top of BLACKLISTED_UNICODE_CATEGORIES
+# bmp-only is also the UTF-16 optimum (every sign is one code unit), utf8-optimal is printable ASCII
+UNICODE_ALPHABET_PROFILES: dict[str, int] = {'full': 0x10FFFF, 'bmp-only': 0xFFFF, 'utf8-optimal': 0x7F}
+UNICODE_ALPHABET_PROFILE: str = 'full'
 LOGS_ERROR_GENERIC_PREFIX: str = 'ERROR'
 LOGS_ERROR_ASSERTION_PREFIX: str = 'ASSERTION FAIL'
 LOGS_DEBUG_PREFIX: str = 'DEBUG'
@@ -13,5 +20,42 @@ LOGS_SEPARATOR: str = ' | '
 LOGS_LIGHT_ARCHIVE_UNKNOWN_NAME = "Unknown"
 RECURSION_LIMIT: int = 10000
 COPY_BLOCK_SIZE_BYTES: int = 1024 * 1024 * 16
+ARCHIVE_SPILL_THRESHOLD_BYTES: int = 1024 * 1024 * 64
 LIGHT_ARCHIVE_UNPACK_EXPECTED_MAX_NAME_BYTES: int = 1000
-LIGHT_ARCHIVE_UNPACK_EXPECTED_MAX_ENCODED_INT_BYTES: int = 100
\ No newline at end of file
+LIGHT_ARCHIVE_UNPACK_EXPECTED_MAX_ENCODED_INT_BYTES: int = 100
+# Light archives of many small files can share one trained zstd dictionary (needs zstandard)
+LIGHT_ARCHIVE_DICTIONARY_SIZE_BYTES: int = 1024 * 110
+# Files sampled to train it, and how much of every sampled file is used
+LIGHT_ARCHIVE_DICTIONARY_SAMPLE_FILES: int = 2000
+LIGHT_ARCHIVE_DICTIONARY_SAMPLE_FILE_BYTES: int = 1024 * 16
+# Dictionaries that archives only refer to by ID are kept here
+LIGHT_ARCHIVE_DICTIONARY_STORE_DIR: str = "~/.cache/texter/dictionaries"
+BASE_CONVERSION_LEAF_DIGITS: int = 64
+BASE_CONVERSION_LEAF_BITS: int = 3000
+BIG_INT_BACKEND: str = "auto"
+HIGH_BASE_MODE: str = "integer"
+HIGH_BASE_BLOCK_SIZE_BYTES: int = 256
+HIGH_BASE_BLOCKS_PER_CHUNK: int = 4096
+HIGH_BASE_POWER_OF_TWO_GROUPS_PER_CHUNK: int = 65536
+PARALLEL_WORKERS_COUNT: int = 0
+PARALLEL_MIN_INPUT_BYTES: int = 1024 * 1024
+PARALLEL_TASKS_PER_WORKER: int = 4
+# Codec the payload is compressed with before it's encoded: none, zlib, lzma, bz2, zstd, brotli or auto
+# zstd and brotli need their packages (zstandard, brotli). auto tries them all on a sample of the payload
+COMPRESSION_CODEC: str = "none"
+COMPRESSION_AUTO_SAMPLE_BYTES: int = 1024 * 1024
+COMPRESSION_AUTO_SAMPLE_SLICES: int = 8
+# Roughly how fast a payload is encoded. auto weighs the time a codec takes against the encoding time it saves
+COMPRESSION_AUTO_ENCODE_BYTES_PER_SECOND: int = 1024 * 1024 * 6
+# Before compressing, a sample is probed. Data that won't shrink (e.g. media, archives) is stored as it is
+COMPRESSION_PROBE: bool = True
+COMPRESSION_PROBE_SAMPLE_BYTES: int = 1024 * 64
+# Samples with byte entropy up to this (bits per byte) are compressed without a trial
+COMPRESSION_PROBE_MAX_ENTROPY: float = 7.5
+COMPRESSION_PROBE_TRIAL_CODEC: str = "zlib"
+# The trial (at the codec's lowest level) must save at least this part of the sample
+COMPRESSION_PROBE_MIN_SAVING: float = 0.05
+# Codec searches check whether a trial can still win after every slice of this size
+COMPRESSION_SEARCH_SLICE_BYTES: int = 1024 * 256
+# Chunks waiting between two stages of the encoding pipeline. Memory use grows with it
+PIPELINE_QUEUE_SIZE: int = 4
@@ -1,39 +1,198 @@
-from typing import Callable
+from typing import Any, Callable, Final, NamedTuple
+from array import array
+from pathlib import Path
+import bisect
 import functools
+import hashlib
+import itertools
+import os
+import re
+import sys
 import unicodedata
+import zlib
 from Logger import logger as l
 from settings import (
     UNICODE_HIGHEST_CODE_PONT,
     BLACKLISTED_UNICODE_CATEGORIES,
+    UNICODE_ALPHABET_CACHE_DIR,
+    UNICODE_ALPHABET_PROFILES,
     LOGS_ERROR_GENERIC_PREFIX,
     LOGS_SEPARATOR as s,
 )
 
 
-def _get_allowed_unicode_signs() -> tuple[str, ...]:
-    logs_infix: str = f"{_get_allowed_unicode_signs.__name__}{s}"
+# Code points are kept in arrays of this type. A buffer of them decodes into a string in one step
+CODE_POINTS_TYPECODE: Final = "I"
+CODE_POINTS_ENCODING: str = "utf-32-le" if sys.byteorder == "little" else "utf-32-be"
+# Bump when the layout of the alphabet cache changes. Caches of other versions are rebuilt
+_ALPHABET_CACHE_VERSION: int = 1
+_ALPHABET_CACHE_HEADER_LENGTH: int = 3
+
+
+class UnicodeRanges(NamedTuple):
+    # The alphabet is a few thousand runs of neighbouring code points, so it's kept as runs instead of one entry per sign
+    starts: array[int]  # First code point of every run
+    digits: array[int]  # Digit of the first sign of every run (prefix sums of the run lengths), then the alphabet size
+
+
+def _get_allowed_unicode_ranges() -> UnicodeRanges:
+    # Scanning every code point takes a while, so the result is kept in a cache file between runs
+    logs_infix: str = f"{_get_allowed_unicode_ranges.__name__}{s}"
+
+    cache_path: Path = get_alphabet_cache_path()
+    ranges: UnicodeRanges | None = _load_alphabet_cache(cache_path)
+    if ranges is None:
+        ranges = _scan_allowed_unicode_ranges()
+        _save_alphabet_cache(cache_path, ranges)
+
+    code_points_length: int = ranges.digits[-1]
+    l.debug(
+        f"{logs_infix}Selected {code_points_length} unicode code points in {len(ranges.starts)} ranges"
+    )
+    if code_points_length == 0:
+        raise RuntimeError(
+            f"{LOGS_ERROR_GENERIC_PREFIX}{s}Found ZERO valid code points for your highest code point setting ({UNICODE_HIGHEST_CODE_PONT})"
+        )
+    return ranges
+
+
+get_allowed_unicode_ranges: Callable[[], UnicodeRanges] = functools.lru_cache(
+    maxsize=1, typed=True
+)(_get_allowed_unicode_ranges)
+
 
-    signs: list[str] = []
+def _scan_allowed_unicode_ranges() -> UnicodeRanges:
+    starts: array[int] = array(CODE_POINTS_TYPECODE)
+    digits: array[int] = array(CODE_POINTS_TYPECODE)
     unicode_highest_code_point: int = UNICODE_HIGHEST_CODE_PONT
     excluded_unicode_categories: set[str] = BLACKLISTED_UNICODE_CATEGORIES
 
+    code_points_length: int = 0
+    previous_code_point: int = -2
     for code_point in range(unicode_highest_code_point + 1):
         sign: str = chr(code_point)
         category = unicodedata.category(sign)
 
         if category in excluded_unicode_categories:
             continue
-        signs.append(sign)
+        if code_point != previous_code_point + 1:
+            starts.append(code_point)
+            digits.append(code_points_length)
+        previous_code_point = code_point
+        code_points_length += 1
 
-    signs_tuple: tuple[str, ...] = tuple(signs)
-    signs_length: int = len(signs)
+    digits.append(code_points_length)
+    return UnicodeRanges(starts, digits)
 
-    l.debug(f"{logs_infix}Selected {signs_length} unicode code points")
-    if signs_length == 0:
-        raise RuntimeError(
-            f"{LOGS_ERROR_GENERIC_PREFIX}{s}Found ZERO valid code points for your highest code point setting ({UNICODE_HIGHEST_CODE_PONT})"
+
+def get_alphabet_cache_path() -> Path:
+    # The key covers everything the alphabet depends on. When any of it changes, a new file is built
+    key_source: str = repr(
+        (
+            unicodedata.unidata_version,
+            UNICODE_HIGHEST_CODE_PONT,
+            sorted(BLACKLISTED_UNICODE_CATEGORIES),
+        )
+    )
+    key: str = hashlib.sha256(key_source.encode("utf-8")).hexdigest()[:16]
+    cache_dir: Path = Path(UNICODE_ALPHABET_CACHE_DIR).expanduser()
+    return cache_dir / f"alphabet-{key}.bin"
+
+
+def _load_alphabet_cache(path: Path) -> UnicodeRanges | None:
+    # Format: [ VERSION ] [ RUNS COUNT ] [ CHECKSUM ] ( [ RUN START ] [ RUN LENGTH ] ) ... as little-endian uint32
+    # CHECKSUM is the CRC32 of the runs. A cache that doesn't match its header is rebuilt, never used
+    logs_infix: str = f"{_load_alphabet_cache.__name__}{s}{path}{s}"
+    try:
+        with open(path, "rb") as f:
+            cache_bytes: bytes = f.read()
+    except OSError:
+        l.debug(f"{logs_infix}No alphabet cache")
+        return None
+
+    header: array[int] = array(CODE_POINTS_TYPECODE)
+    runs: array[int] = array(CODE_POINTS_TYPECODE)
+    header_size: int = header.itemsize * _ALPHABET_CACHE_HEADER_LENGTH
+    runs_bytes: bytes = cache_bytes[header_size:]
+    if len(cache_bytes) < header_size or len(runs_bytes) % (runs.itemsize * 2):
+        l.warn(f"{logs_infix}Alphabet cache is damaged! Rebuilding it")
+        return None
+    header.frombytes(cache_bytes[:header_size])
+    runs.frombytes(runs_bytes)
+    if sys.byteorder == "big":
+        header.byteswap()
+        runs.byteswap()
+
+    expected_header: list[int] = [_ALPHABET_CACHE_VERSION, len(runs) // 2, zlib.crc32(runs_bytes)]
+    if header.tolist() != expected_header:
+        l.warn(
+            f"{logs_infix}Header: {header.tolist()}{s}Expected: {expected_header}"
+            f"{s}Alphabet cache is stale or damaged! Rebuilding it"
         )
+        return None
+
+    starts: array[int] = runs[0::2]
+    digits: array[int] = array(CODE_POINTS_TYPECODE, [0])
+    digits.extend(itertools.accumulate(runs[1::2]))
+    l.debug(f"{logs_infix}Loaded alphabet cache")
+    return UnicodeRanges(starts, digits)
+
+
+def _save_alphabet_cache(path: Path, ranges: UnicodeRanges) -> None:
+    logs_infix: str = f"{_save_alphabet_cache.__name__}{s}{path}{s}"
+    runs: array[int] = array(CODE_POINTS_TYPECODE)
+    for i, start in enumerate(ranges.starts):
+        runs.extend((start, ranges.digits[i + 1] - ranges.digits[i]))
+    if sys.byteorder == "big":
+        runs.byteswap()
+    runs_bytes: bytes = runs.tobytes()
+    header: array[int] = array(CODE_POINTS_TYPECODE, [_ALPHABET_CACHE_VERSION, len(runs) // 2, zlib.crc32(runs_bytes)])
+    if sys.byteorder == "big":
+        header.byteswap()
+
+    # Written to a temporary file first, so a crash can't leave a half-written cache behind
+    temporary_path: Path = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with open(temporary_path, "wb") as f:
+            f.write(header.tobytes() + runs_bytes)
+        os.replace(temporary_path, path)
+    except OSError as e:
+        l.warn(f"{logs_infix}Failed to save alphabet cache! {e}")
+        return
+    l.debug(f"{logs_infix}Saved alphabet cache")
+
+
+def get_code_point_digit(code_point: int) -> int:
+    # code point -> digit, or -1 if the sign isn't allowed. For single signs (e.g. trailers) - it doesn't need the
+    # dense index. Bulk conversions use get_allowed_unicode_digits_index instead
+    ranges: UnicodeRanges = get_allowed_unicode_ranges()
+    i: int = bisect.bisect_right(ranges.starts, code_point) - 1
+    if i < 0:
+        return -1
+    offset: int = code_point - ranges.starts[i]
+    if offset >= ranges.digits[i + 1] - ranges.digits[i]:
+        return -1
+    return ranges.digits[i] + offset
 
+
+def _get_allowed_unicode_code_points() -> array[int]:
+    ranges: UnicodeRanges = get_allowed_unicode_ranges()
+    code_points: array[int] = array(CODE_POINTS_TYPECODE)
+    for i, start in enumerate(ranges.starts):
+        code_points.extend(range(start, start + ranges.digits[i + 1] - ranges.digits[i]))
+    return code_points
+
+
+get_allowed_unicode_code_points: Callable[[], array[int]] = functools.lru_cache(
+    maxsize=1, typed=True
+)(_get_allowed_unicode_code_points)
+
+
+def _get_allowed_unicode_signs() -> tuple[str, ...]:
+    # One str object per sign is tens of MB, so this is only built for callers that really want a tuple
+    code_points: array[int] = get_allowed_unicode_code_points()
+    signs_tuple: tuple[str, ...] = tuple(map(chr, code_points))
     return signs_tuple
 
 
@@ -42,4 +201,94 @@ get_allowed_unicode_signs: Callable[[], tuple[str, ...]] = functools.lru_cache(
 )(_get_allowed_unicode_signs)
 
 
-ALLOWED_UNICODE_SIGNS: tuple[str, ...] = get_allowed_unicode_signs()
+def _get_allowed_unicode_digits_index() -> array[int]:
+    # Dense reverse lookup: index[code point] is the digit of that sign, or -1 if the sign isn't allowed
+    ranges: UnicodeRanges = get_allowed_unicode_ranges()
+    digits_index: array[int] = array("i", [-1]) * (sys.maxunicode + 1)
+    for i, start in enumerate(ranges.starts):
+        first_digit: int = ranges.digits[i]
+        next_digit: int = ranges.digits[i + 1]
+        digits_index[start : start + next_digit - first_digit] = array(
+            "i", range(first_digit, next_digit)
+        )
+    return digits_index
+
+
+get_allowed_unicode_digits_index: Callable[[], array[int]] = functools.lru_cache(
+    maxsize=1, typed=True
+)(_get_allowed_unicode_digits_index)
+
+
+def get_profile_alphabet_size(profile: str) -> int:
+    # Every profile is a prefix of the allowed alphabet, so digits mean the same signs in all of them
+    if profile not in UNICODE_ALPHABET_PROFILES:
+        raise RuntimeError(
+            f"{LOGS_ERROR_GENERIC_PREFIX}{s}{get_profile_alphabet_size.__name__}{s}Profile: {profile}"
+            f"{s}Unknown alphabet profile! Options: {', '.join(UNICODE_ALPHABET_PROFILES)}"
+        )
+    highest_code_point: int = UNICODE_ALPHABET_PROFILES[profile]
+    alphabet_size: int = bisect.bisect_right(get_allowed_unicode_code_points(), highest_code_point)
+    return alphabet_size
+
+
+@functools.lru_cache(maxsize=None)
+def get_invalid_signs_pattern(alphabet_size: int) -> re.Pattern[str]:
+    # Matches any sign that isn't one of the first `alphabet_size` allowed signs, so whole chunks of text
+    # are validated in a single search. A character class is checked range by range,
+    # so the biggest runs go first - most signs then stop at one of the first few ranges
+    ranges: UnicodeRanges = get_allowed_unicode_ranges()
+    runs: list[tuple[int, int]] = []  # (length, first code point)
+    for i, start in enumerate(ranges.starts):
+        length: int = min(ranges.digits[i + 1], alphabet_size) - ranges.digits[i]
+        if length <= 0:
+            break
+        runs.append((length, start))
+    runs.sort(reverse=True)
+
+    allowed_class: str = "".join(
+        f"{re.escape(chr(start))}-{re.escape(chr(start + length - 1))}" for length, start in runs
+    )
+    return re.compile(f"[^{allowed_class}]")
+
+
+def get_encoded_lengths_counts(alphabet_size: int, encoding: str) -> dict[int, int]:
+    # How many of the first `alphabet_size` allowed signs take each count of bytes in the encoding
+    # Encoded lengths only change at a few code points, so the counts come from bisecting the sorted code points
+    logs_infix: str = f"{get_encoded_lengths_counts.__name__}{s}"
+    code_points: array[int] = get_allowed_unicode_code_points()
+
+    boundaries: list[tuple[int, int]]  # (first code point past this length, length)
+    if encoding == "utf-8":
+        boundaries = [(0x80, 1), (0x800, 2), (0x10000, 3), (sys.maxunicode + 1, 4)]
+    elif encoding in ("utf-16", "utf-16-le", "utf-16-be"):
+        boundaries = [(0x10000, 2), (sys.maxunicode + 1, 4)]
+    else:
+        raise RuntimeError(
+            f"{LOGS_ERROR_GENERIC_PREFIX}{s}{logs_infix}Encoding: {encoding}{s}Unsupported encoding!"
+        )
+
+    counts: dict[int, int] = {}
+    previous_index: int = 0
+    for boundary, length in boundaries:
+        index: int = bisect.bisect_left(code_points, boundary, 0, alphabet_size)
+        counts[length] = index - previous_index
+        previous_index = index
+    return counts
+
+
+# Built on first access through __getattr__, so importing this module doesn't load the alphabet
+# Code that runs often should call the getters instead
+ALLOWED_UNICODE_CODE_POINTS: array[int]
+ALLOWED_UNICODE_SIGNS: tuple[str, ...]
+ALLOWED_UNICODE_DIGITS_INDEX: array[int]
+_LAZY_ATTRIBUTES: dict[str, Callable[[], Any]] = {
+    "ALLOWED_UNICODE_CODE_POINTS": get_allowed_unicode_code_points,
+    "ALLOWED_UNICODE_SIGNS": get_allowed_unicode_signs,
+    "ALLOWED_UNICODE_DIGITS_INDEX": get_allowed_unicode_digits_index,
+}
+
+
+def __getattr__(name: str) -> Any:
+    if name in _LAZY_ATTRIBUTES:
+        return _LAZY_ATTRIBUTES[name]()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")